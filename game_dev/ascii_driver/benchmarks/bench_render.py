@@ -0,0 +1,91 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import game  # noqa: E402
+
+
+def clear_sequence() -> str:
+    # what `clear` sends to the terminal on every legacy frame
+    try:
+        return subprocess.run(["clear"], capture_output=True, text=True).stdout
+    except OSError:
+        return ""
+
+
+def simulate(frames: int, level: int, spawn_every: int, seed: int) -> list:
+    # the screens a run produces, without player collisions ending it early
+    road = game.Road(random.Random(seed))
+    road.start(0.0)
+    for _ in range(level - 1):
+        road.game_rules.increment_settings(), road.update_road()
+    screens = []
+    for i in range(frames):
+        now = i * road.game_rules.t_per_frame
+        if i % spawn_every == 0:
+            road.spawn_obstacles(now), road.spawn_powerup(now)
+            road.cleanup_spawn_cycle()
+        road.try_destroy(), road.flip_mid_lane(), road.advance(now)
+        screens.append(game.compose_screen(road, str(i)))
+    return screens
+
+
+def legacy_frame(lines: list, sink, clear: str) -> int:
+    os.system("clear >/dev/null 2>&1")
+    text = "\n".join(lines) + "\n"
+    print(text, end="", file=sink)
+    return len(clear.encode()) + len(text.encode())
+
+
+def bench(screens: list, draw) -> dict:
+    times, sizes = [], []
+    for lines in screens:
+        t = time.perf_counter()
+        sizes.append(draw(lines))
+        times.append((time.perf_counter() - t) * 1000)
+    return {
+        "frames": len(screens),
+        "median_frame_ms": round(statistics.median(times), 4),
+        "p99_frame_ms": round(sorted(times)[int(len(times) * 0.99) - 1], 4),
+        "max_fps": round(1000 / statistics.median(times), 1),
+        "mean_bytes": round(statistics.mean(sizes), 1),
+        "total_kb": round(sum(sizes) / 1024, 1),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ascii driver render")
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 7])
+    parser.add_argument("--spawn-every", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    clear, results = clear_sequence(), []
+    for level in args.levels:
+        screens = simulate(args.frames, level, args.spawn_every, args.seed)
+        renderer = game.FrameRenderer(out=io.StringIO())
+        legacy = bench(screens, lambda lines: legacy_frame(lines, io.StringIO(), clear))
+        diffed = bench(screens, renderer.draw)
+        results.append(
+            {
+                "level": level,
+                "legacy": legacy,
+                "diff": diffed,
+                "bytes_ratio": round(diffed["mean_bytes"] / legacy["mean_bytes"], 3),
+                "frame_time_ratio": round(
+                    diffed["median_frame_ms"] / legacy["median_frame_ms"], 3
+                ),
+            }
+        )
+    print(json.dumps(results, indent=2))
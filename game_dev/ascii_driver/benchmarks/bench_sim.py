@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import game  # noqa: E402
+
+
+def make_game(level: int, max_assets: int, seed: int) -> game.Game:
+    # a headless game held at one level, with the asset cap raised
+    g = game.Game(headless=True, seed=seed)
+    rules = g.Road.game_rules
+    for _ in range(level - 1):
+        rules.increment_settings(), g.Road.update_road()
+    rules.max_n_assets, rules.secs_per_lvl = max_assets, float("inf")
+    return g
+
+
+def bench(level: int, max_assets: int, ticks: int, seed: int) -> dict:
+    # crashes start a new game on the next seed, the clock keeps running
+    done = crashes = live = 0
+    elapsed = 0.0
+    while done < ticks:
+        g = make_game(level, max_assets, seed + crashes)
+        t = time.perf_counter()
+        over = None
+        try:
+            while g.ticks < ticks - done:
+                g.tick()
+                live += len(g.Road.assets)
+        except game.GameOver as e:
+            over = e.reason
+        elapsed += time.perf_counter() - t
+        done += g.ticks
+        crashes += over == "crash"
+    return {
+        "level": level,
+        "max_assets": max_assets,
+        "ticks": done,
+        "ticks_per_sec": round(done / elapsed),
+        "us_per_tick": round(elapsed / done * 1e6, 2),
+        "mean_assets": round(live / done, 1),
+        "crashes": crashes,
+    }
+
+
+def bench_replay(path: str) -> dict:
+    replay = game.load_replay(path)
+    t = time.perf_counter()
+    g, over = game.run_replay(replay)
+    elapsed = time.perf_counter() - t
+    return {
+        "replay": path,
+        "ticks": g.ticks,
+        "over": over,
+        "ticks_per_sec": round(g.ticks / elapsed),
+        "digest": g.state_digest(),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ascii driver ticks")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 3, 5, 7])
+    parser.add_argument("--assets", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--ticks", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--replay", nargs="+", default=None, help="time replay files")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.replay:
+        results = [bench_replay(path) for path in args.replay]
+    else:
+        results = [
+            bench(level, n, args.ticks, args.seed)
+            for level in args.levels
+            for n in args.assets
+        ]
+    meta = {"python": platform.python_version(), "platform": platform.platform()}
+    print(json.dumps({"meta": meta, "results": results}, indent=2))
@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import game  # noqa: E402
+
+
+class PlainAsset(object):
+    # an approacher as it was before the asset table, for the advance baseline
+    def __init__(self, frame_count: int):
+        self.frame_count = frame_count
+
+    def shift(self, units):
+        self.frame_count += units
+
+
+def make_road(n: int, level: int, length: int, seed: int) -> game.Road:
+    # n assets spread over the road, their jump timers spread over a few seconds
+    rng = random.Random(seed)
+    road = game.Road(rng)
+    road.start(0.0)
+    rules = road.game_rules
+    for _ in range(level - 1):
+        rules.increment_settings(), road.update_road()
+    rules.window_len, rules.max_n_assets = length, n
+    road.update_road()
+    assets = [game.Approacher(True, rules, 0.0, rng, road.table) for _ in range(n)]
+    slots = road.slots(assets)
+    spread = np.random.default_rng(seed)
+    road.table.frame[slots] = spread.integers(0, length, size=n)
+    road.table.jumped[slots] = spread.uniform(-2 * rules.asset_jump_time, 0, size=n)
+    road.add_assets(assets)
+    return road
+
+
+def timed(func, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+    return statistics.median(times) * 1e6
+
+
+def bench(n: int, args) -> dict:
+    road = make_road(n, args.level, args.length, args.seed)
+    dt, ticks, jumps = road.game_rules.t_per_frame, [], 0
+    for i in range(args.ticks):
+        now, before = (i + 1) * dt, road.table.jumped.copy()
+        t = time.perf_counter()
+        road.try_destroy(), road.advance_assets(now)
+        ticks.append(time.perf_counter() - t)
+        jumps += int(np.count_nonzero(road.table.jumped != before))
+    plain = [PlainAsset(a.frame_count) for a in road.assets]
+    tick_us = statistics.median(ticks) * 1e6
+    return {
+        "assets": n,
+        "left_on_road": len(road.assets),
+        "us_per_tick": round(tick_us, 2),
+        "ns_per_asset_tick": round(tick_us * 1000 / n, 1),
+        "jumps_per_tick": round(jumps / args.ticks, 1),
+        "advance_table_us": round(timed(road.table.advance, args.repeat), 2),
+        "advance_objects_us": round(
+            timed(lambda: list(map(lambda a: a.shift(1), plain)), args.repeat), 2
+        ),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ascii driver assets")
+    parser.add_argument("--assets", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--level", type=int, default=7)
+    parser.add_argument("--length", type=int, default=1000, help="road length")
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = [bench(n, args) for n in args.assets]
+    meta = {"python": platform.python_version(), "platform": platform.platform()}
+    print(json.dumps({"meta": meta, "results": results}, indent=2))
@@ -1,10 +1,14 @@
 #!/usr/bin/python
+import re
+import sys
+import json
 import random
 import time
+import hashlib
+import argparse
+import unicodedata
 import numpy as np
 from scipy import constants
-from pynput import keyboard
-from os import system as run
 
 # DEFAULT GAME CONFIGURATION
 DEFAULT_WINDOW_LENGTH = 100
@@ -20,6 +24,12 @@ DEFAULT_RULES_SET = [
     tuple([i * constants.milli for i in [60, 5, 5]]),
     (5, 0.5, 0.5),
 ]
+NO_SLOTS = np.empty(0, dtype=np.int64)
+REPLAY_VERSION = 2  # 2: lane jumps draw their directions in one call
+DEFAULT_RENDER_HZ = 60
+DEFAULT_MAX_CATCHUP_TICKS = 10  # a stalled frame drops time past this many ticks
+DEFAULT_SHOW_FPS = True
+DEFAULT_RUN_GAP = 4  # unchanged cells re-sent instead of moving the cursor
 DEFAULT_PLAYER_CAR, DEFAULT_BULLET = """.-'--`-._\n'-O---O--'""", ">"
 
 OBSTACLES = [
@@ -52,21 +62,188 @@ def measure_asset(txt: str) -> tuple[int, int]:
     return len(max(lines, key=len)), len(lines)
 
 
+# WORLD STATE
+ASSET_KINDS = [(True, *a) for a in OBSTACLES] + [(False, *a) for a in POWERUPS]
+OBSTACLE_KINDS = list(range(len(OBSTACLES)))
+POWERUP_KINDS = list(range(len(OBSTACLES), len(ASSET_KINDS)))
+KIND_SIZES = np.array([measure_asset(k[2]) for k in ASSET_KINDS], dtype=np.int64)
+TABLE_COLUMNS = ("lane", "frame", "width", "kind", "jumped", "alive", "owner")
+
+
+class AssetTable(object):
+    # every approacher is one slot across these arrays, so moving the whole
+    # road is a few array operations a tick; freed slots are reused
+    def __init__(self, capacity: int = 64):
+        self.lane = np.zeros(capacity, dtype=np.int64)
+        self.frame = np.zeros(capacity, dtype=np.int64)
+        self.width = np.zeros(capacity, dtype=np.int64)
+        self.kind = np.zeros(capacity, dtype=np.int16)
+        self.jumped = np.zeros(capacity, dtype=np.float64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.owner = np.full(capacity, None, dtype=object)  # slot -> Approacher
+        self.lane[:] = -1
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def grow(self) -> None:
+        n = len(self.alive)
+        for name in TABLE_COLUMNS:
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.zeros_like(column)]))
+        self.lane[n:], self.owner[n:] = -1, None
+        self.free = list(range(2 * n - 1, n - 1, -1)) + self.free
+
+    def add(self, kind: int, lane: int, now: float) -> int:
+        if not self.free:
+            self.grow()
+        slot = self.free.pop()
+        self.lane[slot], self.kind[slot], self.jumped[slot] = lane, kind, now
+        self.frame[slot] = self.width[slot] = KIND_SIZES[kind][0]
+        self.alive[slot] = True
+        return slot
+
+    def remove(self, slots: np.ndarray) -> None:
+        # -1 is in no lane
+        self.alive[slots], self.lane[slots], self.owner[slots] = False, -1, None
+        self.free += slots.tolist()
+
+    def advance(self) -> None:
+        self.frame += 1  # dead slots are reset when reused
+
+    def shift_lane(self, lane: int, units: int) -> None:
+        np.add(self.frame, units, out=self.frame, where=self.lane == lane)
+
+    def shift_lanes(self, units: np.ndarray) -> None:
+        # units[lane] added to every asset in that lane
+        self.frame[self.alive] += units[self.lane[self.alive]]
+
+    def due_jumps(self, now: float, jump_time: float) -> np.ndarray:
+        return self.alive & (np.round(now - self.jumped) > jump_time)
+
+    def leaving(self, length: int) -> np.ndarray:
+        return np.flatnonzero(self.alive & (self.frame > length))
+
+
+class SpriteCache(object):
+    # everything drawn on the road, colored and measured once; the road only
+    # ever joins these strings
+    def __init__(self, Settings: object):
+        self.assets = [
+            color_string_on_console_stdout("red" if is_obstacle else "green", ascii)
+            for is_obstacle, _, ascii in ASSET_KINDS
+        ]
+        self.sizes = KIND_SIZES
+        self.player, self.player_size = DEFAULT_PLAYER_CAR, measure_asset(
+            DEFAULT_PLAYER_CAR
+        )
+        self.player_shield = color_string_on_console_stdout("green", DEFAULT_PLAYER_CAR)
+        self.player_gun = [
+            DEFAULT_PLAYER_CAR
+            + Settings.open_char * (spacing % Settings.window_len)
+            + DEFAULT_BULLET
+            for spacing in range(DEFAULT_BULLET_FRAME_CYCLE)
+        ]
+        self.mid_char, self.mid_lanes = Settings.mid_char, {}
+
+    def mid_lane(self, length: int) -> tuple[str, str]:
+        # the dashed line and the same line reversed, the two phases it flips
+        # between every frame
+        if length not in self.mid_lanes:
+            dashes = self.mid_char * round(length / 2)
+            self.mid_lanes[length] = tuple(
+                color_string_on_console_stdout("yellow", d)
+                for d in (dashes, dashes[::-1])
+            )
+        return self.mid_lanes[length]
+
+
+def slot_property(column: str, cast):
+    return property(
+        lambda self: cast(getattr(self.table, column)[self.slot]),
+        lambda self, v: getattr(self.table, column).__setitem__(self.slot, v),
+    )
+
+
+# TERMINAL OUTPUT
+CSI, blank_cell = "\x1b[", ("", " ")
+ansi_sgr = re.compile(r"(\x1b\[[0-9;]*m)")
+
+
+def cell_width(ch: str) -> int:
+    return 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
+
+
+def split_cells(line: str, style: str) -> tuple[list, str]:
+    # one (style, char) per terminal column, the right half of a wide char is
+    # (style, ""); the style carries over from the previous line like it does
+    # on the terminal
+    cells = []
+    for i, part in enumerate(ansi_sgr.split(line)):
+        if i % 2:
+            style = "" if part == color_terminate else part
+            continue
+        for ch in part:
+            if ch == "\t":
+                cells += [(style, " ")] * (8 - len(cells) % 8)
+            elif cell_width(ch) == 2:
+                cells += [(style, ch), (style, "")]
+            else:
+                cells.append((style, ch))
+    return cells, style
+
+
+def changed_runs(new: list, old: list, gap: int) -> list[list]:
+    runs = []
+    for x in range(max(len(new), len(old))):
+        cell = new[x] if x < len(new) else blank_cell
+        if cell == (old[x] if x < len(old) else blank_cell):
+            continue
+        if runs and x - runs[-1][1] <= gap:
+            runs[-1][1] = x
+        else:
+            runs.append([x, x])
+    return runs
+
+
 # GAME OBJECTS
+class GameOver(Exception):
+    # "crash" or "quit"
+    def __init__(self, reason: str):
+        super(GameOver, self).__init__(reason)
+        self.reason = reason
+
+
 class KeyListner(object):
     def __init__(self):
+        from pynput import keyboard  # needs a display, only live games listen
+
+        self.keys = {
+            keyboard.Key.up: "up",
+            keyboard.Key.down: "down",
+            keyboard.Key.esc: "esc",
+        }
         self.direction, self.quit = None, False
         keyboard.Listener(on_press=lambda x: self.process_key(x)).start()
 
     def process_key(self, key: object) -> None:
-        if key in {keyboard.Key.up, keyboard.Key.down, keyboard.Key.esc}:
-            self.quit, self.direction = (
-                (True, None)
-                if key == keyboard.Key.esc
-                else (False, str(key).lstrip("."))
-            )
-            return
-        self.direction = None
+        key = self.keys.get(key)
+        self.quit, self.direction = (True, None) if key == "esc" else (False, key)
+
+    def poll(self, tick: int) -> None:
+        pass  # the listener thread sets the keys as they are pressed
+
+
+class ScriptedKeys(object):
+    # plays back (tick, key) pairs, key being "up", "down" or "esc"
+    def __init__(self, events: list = ()):
+        self.direction, self.quit = None, False
+        self.events = {tick: key for tick, key in events}
+
+    def poll(self, tick: int) -> None:
+        key = self.events.get(tick)
+        if key == "esc":
+            self.quit = True
+        elif key:
+            self.direction = key
 
 
 class Settings(object):
@@ -118,9 +295,13 @@ class Settings(object):
 
 
 class Road(object):
-    def __init__(self):
-        self.game_rules, self.assets = Settings(), []
-        self.last_spawn = self.last_lvl = 0
+    def __init__(self, rng: random.Random):
+        self.game_rules, self.rng = Settings(), rng
+        self.table, self.sprites = AssetTable(), SpriteCache(self.game_rules)
+        # the slots behind self.assets, and lane -> the slots in that lane,
+        # furthest along (highest frame_count) first
+        self.order, self.lanes = NO_SLOTS, {}
+        self.last_spawn = self.last_lvl = None
 
     def update_rules(self) -> None:
         if self.game_rules.lvl == 0:
@@ -129,7 +310,7 @@ class Road(object):
         if "player_car" in self.__dict__.keys():
             self.player_car.game_rules = self.game_rules
         else:
-            self.player_car = Player(self.game_rules)
+            self.player_car = Player(self.game_rules, self.sprites)
 
     def update_road_geometry(self) -> None:
         self.num_lanes, self.width, self.length = (
@@ -137,131 +318,157 @@ class Road(object):
             (self.game_rules.nlanes) * 2,
             self.game_rules.window_len,
         )
-        (
-            self.barrier,
-            self.lane,
-        ) = self.game_rules.edge_char * self.length, color_string_on_console_stdout(
-            "yellow", self.game_rules.mid_char * round(self.length / 2)
-        )
+        self.barrier = self.game_rules.edge_char * self.length
+        self.mid_lanes, self.lane_phase = self.sprites.mid_lane(self.length), 0
+        self.lane = self.mid_lanes[0]
 
     def update_road(self) -> None:
         self.update_rules(), self.update_road_geometry()
 
-    def try_lvl_up(self) -> None:
-        if time.time() - self.last_lvl > self.game_rules.secs_per_lvl:
+    def start(self, now: float) -> None:
+        self.update_road()
+        self.last_lvl = now
+
+    def try_lvl_up(self, now: float) -> None:
+        if now - self.last_lvl > self.game_rules.secs_per_lvl:
             self.game_rules.increment_settings(), self.update_road()
-            self.last_lvl = time.time()
+            self.last_lvl = now
 
     def flip_mid_lane(self) -> None:
-        self.lane = color_string_on_console_stdout(
-            "yellow",
-            self.lane[::-1].strip(color_terminate).strip(ascii_color_map["yellow"]),
-        )
+        self.lane_phase ^= 1
+        self.lane = self.mid_lanes[self.lane_phase]
 
-    def try_spawn(self) -> None:
+    def try_spawn(self, now: float) -> None:
         if (
-            round(time.time() - self.last_spawn) > self.game_rules.asset_spawn_time
-        ) and len(self.assets) < self.game_rules.max_n_assets:
-            self.spawn_obstacles(), self.spawn_powerup(), self.cleanup_spawn_cycle()
-            self.last_spawn = time.time()
+            self.last_spawn is None
+            or round(now - self.last_spawn) > self.game_rules.asset_spawn_time
+        ) and len(self.order) < self.game_rules.max_n_assets:
+            self.spawn_obstacles(now), self.spawn_powerup(now)
+            self.cleanup_spawn_cycle()
+            self.last_spawn = now
 
-    def order_assets(self) -> None:
-        self.assets = sorted(self.assets, key=lambda x: x.frame_count, reverse=True)
+    @property
+    def assets(self) -> list[object]:
+        return self.table.owner[self.order].tolist()
 
-    def get_assets_to_free(self) -> set:
-        return set(filter(lambda i: i.frame_count > len(self.barrier), self.assets))
+    def slots(self, assets: list[object]) -> np.ndarray:
+        return np.fromiter((a.slot for a in assets), dtype=np.int64, count=len(assets))
+
+    def order_assets(self) -> None:
+        frames = self.table.frame[self.order]
+        self.order = self.order[np.argsort(-frames, kind="stable")]
 
     def try_destroy(self):
-        freeing = self.get_assets_to_free()
-        list(map(lambda i: self.remove_asset(i), freeing)), list(
-            map(
-                lambda f: self.shift_lane_assets(
-                    self.in_lane(f.lane_pos), -measure_asset(f.ascii)[0]
-                ),
-                freeing,
+        t = self.table
+        leaving = t.leaving(len(self.barrier))
+        if not len(leaving):
+            return
+        # every lane closes up by the widths of the assets that left it
+        units = np.bincount(t.lane[leaving], t.width[leaving], minlength=self.width)
+        counts = np.bincount(t.lane[leaving], minlength=self.width)
+        for lane_pos in np.flatnonzero(counts).tolist():
+            self.free_lane_front(lane_pos, int(counts[lane_pos]))
+        self.drop_freed()
+        t.shift_lanes(-units.astype(np.int64))
+
+    def add_assets(self, assets: list[object]) -> None:
+        slots = self.slots(assets)
+        self.order = np.concatenate([self.order, slots])
+        self.file_slots(slots)
+
+    def file_slots(self, slots: np.ndarray) -> None:
+        # a stable sort after appending files them as inserting one at a time would
+        t = self.table
+        for lane_pos in np.unique(t.lane[slots]).tolist():
+            lane = np.concatenate(
+                [self.lane_slots(lane_pos), slots[t.lane[slots] == lane_pos]]
             )
-        )
+            self.lanes[lane_pos] = lane[np.argsort(-t.frame[lane], kind="stable")]
+
+    def lane_slots(self, lane_num: int) -> np.ndarray:
+        # the index itself, don't add or remove through it
+        return self.lanes.get(lane_num, NO_SLOTS)
 
     def in_lane(self, lane_num: int) -> list[object]:
-        return list(filter(lambda x: x.lane_pos == lane_num, self.assets))
+        return self.table.owner[self.lane_slots(lane_num)].tolist()
 
     def in_player_lane(self) -> list[object]:
         return self.in_lane(self.player_car.lane_pos)
 
     def limit_approachers(self):
-        while len(self.assets) > self.game_rules.max_n_assets:
-            self.assets.pop()
+        t, keep = self.table, self.game_rules.max_n_assets
+        if len(self.order) <= keep:
+            return
+        extra, self.order = self.order[keep:], self.order[:keep]
+        for lane_pos in np.unique(t.lane[extra]).tolist():
+            lane = self.lanes[lane_pos]
+            self.lanes[lane_pos] = lane[~np.isin(lane, extra)]
+        t.remove(extra)
 
     def road_is_clean(self):
-        all_counts = [i.frame_count for i in self.assets]
-        return True if len(all_counts) == len(set(all_counts)) else False
+        all_counts = self.table.frame[self.table.alive]
+        return len(all_counts) == len(np.unique(all_counts))
 
     def lane_has_colliding_frames(self, lane_pos: int) -> bool:
-        asset_frame_nums = [i.frame_count for i in self.in_lane(lane_pos)]
-        return False if len(asset_frame_nums) == len(set(asset_frame_nums)) else True
+        frames = self.table.frame[self.lane_slots(lane_pos)]
+        return bool((frames[1:] == frames[:-1]).any())
 
     def cleanup_colliding_asset_frames(self) -> None:
         if self.road_is_clean():
             return
         for ln in range(self.width - 1):
             while self.lane_has_colliding_frames(ln):
-                self.assets.remove(max(self.in_lane(ln), key=lambda x: x.frame_count))
+                self.free_lane_front(ln)
+        self.drop_freed()
 
     def cleanup_spawn_cycle(self) -> None:
         self.order_assets(), self.limit_approachers(), self.cleanup_colliding_asset_frames()
 
-    def spawn_obstacles(self) -> None:
-        self.assets += [
-            Approacher(True, self.game_rules)
-            for _ in range(random.choice(range(self.width - 1)))
-        ]
+    def spawn_obstacles(self, now: float) -> None:
+        self.add_assets(
+            [
+                Approacher(True, self.game_rules, now, self.rng, self.table)
+                for _ in range(self.rng.choice(range(self.width - 1)))
+            ]
+        )
 
-    def spawn_powerup(self) -> None:
-        if not [i for i in self.assets if i.is_obstacle == False]:
+    def spawn_powerup(self, now: float) -> None:
+        t = self.table
+        if not (t.alive & (t.kind >= len(OBSTACLES))).any():
             rng = [
                 *[[True] * round(self.game_rules.pot_pwrup * 100)],
                 *[[False] * round((1 - self.game_rules.pot_pwrup) * 100)],
             ]
-            if random.choice(rng):
-                self.assets += [Approacher(False, self.game_rules)]
+            if self.rng.choice(rng):
+                self.add_assets(
+                    [Approacher(False, self.game_rules, now, self.rng, self.table)]
+                )
 
     def create_ascii_player_area(self, lane_index: int) -> str:
         return self.player_car.ascii if self.player_car.lane_pos == lane_index else ""
 
-    def create_ascii_asset(self, asset: object) -> str:
-        return color_string_on_console_stdout(
-            "red" if asset.is_obstacle else "green", asset.ascii
-        )
-
-    def create_asset_lane(self, assets: list[object]) -> str:
-        lane = ""
-        for i, a in enumerate(assets):
+    def create_asset_lane(self, lane_index: int, slots: np.ndarray) -> str:
+        open_char, sprites, lane = self.game_rules.open_char, self.sprites.assets, []
+        frames = self.table.frame[slots].tolist()
+        for i, kind in enumerate(self.table.kind[slots].tolist()):
             if i == 0:
+                gap = len(self.barrier) - frames[0]
                 if (
                     self.player_car.power == "gun"
-                    and assets[0].lane_pos == self.player_car.lane_pos
+                    and lane_index == self.player_car.lane_pos
                 ):
-                    lane += self.game_rules.open_char * round(
-                        (len(self.barrier) - a.frame_count)
-                        - self.player_car.bullet_spacing,
-                        3,
-                    ) + self.create_ascii_asset(a)
-                else:
-                    lane += self.game_rules.open_char * round(
-                        (len(self.barrier) - a.frame_count)
-                    ) + self.create_ascii_asset(a)
+                    gap -= self.player_car.bullet_spacing
             else:
-                lane += self.game_rules.open_char * (
-                    assets[i - 1].frame_count - a.frame_count
-                ) + self.create_ascii_asset(a)
-        return lane
+                gap = frames[i - 1] - frames[i]
+            lane += [open_char * gap, sprites[kind]]
+        return "".join(lane)
 
     def create_ascii_lane(self, lane_index: int) -> str:
-        lane_assets = self.in_lane(lane_index)
-        if not lane_assets:
+        slots = self.lane_slots(lane_index)
+        if not len(slots):
             return self.create_ascii_player_area(lane_index)
         return self.create_ascii_player_area(lane_index) + self.create_asset_lane(
-            lane_assets
+            lane_index, slots
         )
 
     def player_hit(self) -> bool:
@@ -273,17 +480,11 @@ class Road(object):
         )
         return True if frames_ahead_of_contact_point[0] != "" else False
 
-    def shift_lane_assets(self, assets, shift) -> None:
-        list(map(lambda x: x.shift(shift), assets))
-
     def adjust_assests_after_player_move(self, previous_lane: int) -> None:
-        initial_lane, final_lane = self.in_lane(previous_lane), self.in_player_lane()
-        if not (initial_lane or final_lane):
+        if previous_lane == self.player_car.lane_pos:
             return
-        if initial_lane:
-            self.shift_lane_assets(initial_lane, -self.player_car.sx)
-        if final_lane:
-            self.shift_lane_assets(final_lane, self.player_car.sx)
+        self.table.shift_lane(previous_lane, -self.player_car.sx)
+        self.table.shift_lane(self.player_car.lane_pos, self.player_car.sx)
 
     def move_lane(self, Keys: object) -> None:
         prev = self.player_car.lane_pos
@@ -292,33 +493,72 @@ class Road(object):
         ), self.adjust_assests_after_player_move(prev)
         Keys.direction = None  # key sticks if not reset
 
-    def remove_asset(self, Asset: object) -> None:
-        self.assets = list(filter(lambda x: x != Asset, self.assets))
+    def free_lane_front(self, lane_pos: int, n: int = 1) -> None:
+        # lanes are sorted by frame_count, so what leaves the road, is hit or
+        # doubles up on a frame is always at the front of its lane
+        lane = self.lanes[lane_pos]
+        self.table.remove(lane[:n])
+        self.lanes[lane_pos] = lane[n:]
+
+    def drop_freed(self) -> None:
+        # once however many were freed, before any spawn can reuse their slots
+        self.order = self.order[self.table.alive[self.order]]
 
     def process_collision(self) -> None:
-        collides_with, powerup = self.in_player_lane()[0], self.player_car.power
+        collides_with = self.table.owner[self.lane_slots(self.player_car.lane_pos)[0]]
+        powerup = self.player_car.power
         if collides_with.is_obstacle:
-            print(
-                "GAME OVER"
-            ), exit() if not powerup else self.player_car.loose_powers(), self.remove_asset(
-                collides_with
-            )
+            if not powerup:
+                raise GameOver("crash")
+            self.player_car.loose_powers(), self.free_lane_front(collides_with.lane_pos)
+            self.drop_freed()
             return
-        self.player_car.gain_powers(
-            collides_with
-        ) if not powerup else self.remove_asset(collides_with)
+        if not powerup:
+            self.player_car.gain_powers(collides_with)
+        else:
+            self.free_lane_front(collides_with.lane_pos), self.drop_freed()
 
     def check_collisions(self) -> None:
         self.process_collision() if self.player_hit() else None
 
-    def get_asset_positions(self) -> list[tuple]:
-        return [(str(id(i)), i.lane_pos, i.frame_count) for i in self.assets]
-
-    def advance_assets(self) -> None:
-        list(map(lambda a: a.advance(self), self.assets))
-
-    def advance(self) -> None:
-        self.player_car.update_ascii(), self.advance_assets()
+    def advance_assets(self, now: float) -> None:
+        # jumps first, then the whole road moves a frame: shifts only add to
+        # frame_count so the order doesn't matter, and lanes stay sorted.
+        # jumps draw from the rng, so they go in self.assets order
+        due = self.table.due_jumps(now, self.game_rules.asset_jump_time)
+        if due.any():
+            self.jump_assets(self.order[due[self.order]], now)
+        self.table.advance()
+
+    def jump_assets(self, slots: np.ndarray, now: float) -> None:
+        # every due jump at once, with the frames they would have one after
+        # the other: a jump takes its width off the assets left in its old
+        # lane and adds it to the ones in its new lane, so a jumper sees the
+        # earlier jumps in its old lane and the later ones in its new lane
+        t, lf, n = self.table, self.width - 1, len(slots)
+        rows = np.arange(n)
+        steps = np.array(self.rng.choices((-1, 1), k=n))
+        prev, width = t.lane[slots], t.width[slots]
+        lane = prev + steps
+        lane[lane < 0] = lf
+        lane[lane > lf] = 0
+        effect = np.zeros((n, self.width), dtype=np.int64)
+        effect[rows, prev], effect[rows, lane] = -width, width
+        units = np.bincount(lane, width, self.width)
+        net = (units - np.bincount(prev, width, self.width)).astype(np.int64)
+        before = np.cumsum(effect, axis=0) - effect
+        after = net - before - effect
+        # everything moves with its lane, then the jumpers are corrected
+        t.shift_lanes(net)
+        t.frame[slots] += before[rows, prev] + after[rows, lane] - net[prev]
+        t.lane[slots], t.jumped[slots] = lane, now
+        for lane_pos in np.unique(prev).tolist():
+            lane = self.lanes[lane_pos]
+            self.lanes[lane_pos] = lane[t.lane[lane] == lane_pos]
+        self.file_slots(slots)
+
+    def advance(self, now: float) -> None:
+        self.player_car.update_ascii(), self.advance_assets(now)
 
     def __repr__(self) -> str:
         return "\n".join(
@@ -339,9 +579,10 @@ class Road(object):
 
 
 class Player(object):
-    def __init__(self, Settings: object):
-        self.game_rules, self.power, self.ascii = Settings, None, DEFAULT_PLAYER_CAR
-        self.sx, self.sy = measure_asset(self.ascii)
+    def __init__(self, Settings: object, sprites: SpriteCache):
+        self.game_rules, self.power, self.sprites = Settings, None, sprites
+        self.ascii = sprites.player
+        self.sx, self.sy = sprites.player_size
         self.lane_pos = self.bullet_spacing = 0
 
     def move_lane(self, direction: str) -> None:
@@ -358,27 +599,23 @@ class Player(object):
         )
 
     def update_ascii(self) -> None:
+        sprites = self.sprites
         if not self.power:
-            self.ascii = DEFAULT_PLAYER_CAR
+            self.ascii = sprites.player
         elif "s" in set(self.power):
             self.ascii = (
-                DEFAULT_PLAYER_CAR
-                if "m" in set(self.ascii)
-                else color_string_on_console_stdout("green", DEFAULT_PLAYER_CAR)
+                sprites.player
+                if self.ascii is sprites.player_shield
+                else sprites.player_shield
             )
         else:
-            if DEFAULT_BULLET not in set(self.ascii):
-                self.ascii = DEFAULT_PLAYER_CAR + DEFAULT_BULLET
+            if DEFAULT_BULLET not in self.ascii:
+                self.ascii = sprites.player_gun[0]
             else:
                 self.bullet_spacing = (
                     DEFAULT_BULLET_SPEED + self.bullet_spacing
                 ) % DEFAULT_BULLET_FRAME_CYCLE
-                self.ascii = (
-                    DEFAULT_PLAYER_CAR
-                    + self.game_rules.open_char
-                    * (self.bullet_spacing % self.game_rules.window_len)
-                    + DEFAULT_BULLET
-                )
+                self.ascii = sprites.player_gun[self.bullet_spacing]
 
     def gain_powers(self, Asset):
         self.power = Asset.name
@@ -388,92 +625,300 @@ class Player(object):
 
 
 class Approacher(object):
-    def __init__(self, is_obstacle: bool, Settings: object):
-        self.is_obstacle, self.a_id = is_obstacle, str(id(self))
-        self.name, self.ascii = random.choice(OBSTACLES if is_obstacle else POWERUPS)
-        self.lane_pos = random.choice([i for i in range(Settings.nlanes * 2)])
-        self.sx, self.sy = measure_asset(self.ascii)
-        self.frame_count, self.last_jumped = self.sx, time.time()
-
-    def advance(self, Road: object) -> None:
-        if round(time.time() - self.last_jumped) > Road.game_rules.asset_jump_time:
-            prev_lane = [i[1] for i in Road.get_asset_positions() if i[0] == self.a_id][
-                0
-            ]
-            self.lane_jump(Road.width - 1)
-            self.last_jumped = time.time()
-            self.adjust_after_jump(prev_lane, Road)
-        self.frame_count += 1
-
-    def adjust_after_jump(self, prev: list[tuple], Road: object):
-        li_assets, lf_assets = Road.in_lane(prev), list(
-            filter(lambda x: x.a_id != self.a_id, Road.in_lane(self.lane_pos))
-        )
-        if not li_assets and not lf_assets:
-            return
-        if li_assets:
-            Road.shift_lane_assets(li_assets, -self.sx)
-        if lf_assets:
-            Road.shift_lane_assets(lf_assets, self.sx)
-
-    def shift(self, units):
-        self.frame_count += units
-
-    def lane_jump(self, lf):
-        self.lane_pos += np.random.choice(np.arange(-1, 2, 2))
-        self.lane_pos = (
-            lf
-            if self.lane_pos < 0
-            else self.lane_pos and 0
-            if self.lane_pos > lf
-            else self.lane_pos
+    # a view of one slot in the road's AssetTable
+    __slots__ = ("table", "slot")
+
+    lane_pos = slot_property("lane", int)
+    frame_count = slot_property("frame", int)
+    kind = slot_property("kind", int)
+    last_jumped = slot_property("jumped", float)
+
+    def __init__(self, is_obstacle: bool, Settings: object, now: float, rng, table):
+        kind = rng.choice(OBSTACLE_KINDS if is_obstacle else POWERUP_KINDS)
+        lane_pos = rng.choice([i for i in range(Settings.nlanes * 2)])
+        self.table, self.slot = table, table.add(kind, lane_pos, now)
+        table.owner[self.slot] = self
+
+    @property
+    def is_obstacle(self) -> bool:
+        return ASSET_KINDS[self.kind][0]
+
+    @property
+    def name(self) -> str:
+        return ASSET_KINDS[self.kind][1]
+
+    @property
+    def ascii(self) -> str:
+        return ASSET_KINDS[self.kind][2]
+
+    @property
+    def sx(self) -> int:
+        return int(self.table.width[self.slot])
+
+    @property
+    def sy(self) -> int:
+        return int(KIND_SIZES[self.kind][1])
+
+
+class FrameRenderer(object):
+    # keeps the last frame on screen as cells and only sends the cells that
+    # changed, addressed with the cursor, in one write per frame
+    def __init__(self, out=None, show_fps=DEFAULT_SHOW_FPS, gap=DEFAULT_RUN_GAP):
+        self.out, self.show_fps, self.gap = out or sys.stdout, show_fps, gap
+        self.rows, self.shown, self.keys = None, None, []
+        self.fps = self.frame_ms = 0.0
+        self.last_start, self.frames, self.bytes = None, 0, 0
+
+    def parse(self, lines: list[str]) -> list[list]:
+        # rows whose text and starting style did not change reuse their cells
+        rows, keys, style = [], [], ""
+        for y, line in enumerate(lines):
+            key = (style, line)
+            if y < len(self.keys) and self.keys[y][0] == key:
+                cells, style = self.rows[y], self.keys[y][1]
+            else:
+                cells, style = split_cells(line, style)
+            rows.append(cells), keys.append((key, style))
+        self.keys = keys
+        return rows
+
+    def overlay(self, rows: list[list]) -> list[list]:
+        text = f"FPS:{self.fps:6.1f} FRAME:{self.frame_ms:6.2f}ms"
+        width = max([len(r) for r in rows] + [len(text)])
+        top = rows[0] if rows else []
+        top = (
+            top
+            + [blank_cell] * (width - len(text) - len(top))
+            + [("", ch) for ch in text]
         )
+        return [top, *rows[1:]]
+
+    def diff(self, rows: list[list], prev: list[list]) -> list[str]:
+        out, style = [], ""
+        for y in range(max(len(rows), len(prev))):
+            new = rows[y] if y < len(rows) else []
+            old = prev[y] if y < len(prev) else []
+            if new is old:
+                continue
+            for start, end in changed_runs(new, old, self.gap):
+                if start < len(new) and new[start][1] == "":
+                    start -= 1  # redraw the whole wide char
+                out.append(f"{CSI}{y + 1};{start + 1}H")
+                for x in range(start, end + 1):
+                    st, ch = new[x] if x < len(new) else blank_cell
+                    if ch == "":
+                        continue
+                    if st != style:
+                        out.append(color_terminate + st)
+                        style = st
+                    out.append(ch)
+        if style:
+            out.append(color_terminate)
+        return out
+
+    def draw(self, lines: list[str]) -> int:
+        start = time.perf_counter()
+        if self.last_start is not None and start > self.last_start:
+            fps = 1 / (start - self.last_start)
+            self.fps = fps if not self.frames else self.fps + 0.1 * (fps - self.fps)
+        self.last_start = start
+        rows = self.parse(lines)
+        shown = self.overlay(rows) if self.show_fps else rows
+        out = [] if self.rows is not None else [f"{CSI}?25l{CSI}2J"]
+        out += self.diff(shown, self.shown if self.rows is not None else [])
+        out.append(f"{CSI}{len(shown) + 1};1H")  # anything printed lands below
+        payload = "".join(out)
+        self.out.write(payload), self.out.flush()
+        self.rows, self.shown = rows, shown
+        self.frames += 1
+        self.bytes += len(payload.encode())
+        self.frame_ms = (time.perf_counter() - start) * 1000
+        return len(payload.encode())
+
+    def close(self) -> None:
+        self.out.write(f"{color_terminate}{CSI}?25h"), self.out.flush()
+
+
+def compose_screen(Road: object, score: str) -> list[str]:
+    buff, mid = "\n" * 2, "\t" * 3
+    return "\n".join(
+        [
+            "ASCII DRIVER",
+            f"{buff*2}{mid}SCORE: {score}",
+            f"LEVEL:{Road.game_rules.lvl}",
+            buff,
+            str(Road),
+            buff,
+            "MOVE WITH ARROW-KEYS : [↑] & [↓]",
+            "QUIT:[ESC]",
+        ]
+    ).split("\n")
 
 
 class Game(object):
-    def __init__(self):
-        self.Keys, self.Road = KeyListner(), Road()
+    # the road moves one tick every t_per_frame of game time (the level sets
+    # the speed); the screen is redrawn at most DEFAULT_RENDER_HZ times a
+    # second with whatever the latest tick left, so a slow frame skips draws
+    # instead of slowing the road down. game time starts at 0 and only moves
+    # with the ticks, so the seed and the keys per tick decide the whole run
+    def __init__(
+        self,
+        headless=False,
+        seed=None,
+        keys=None,
+        clock=time.monotonic,
+        render_hz=DEFAULT_RENDER_HZ,
+    ):
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(32)
+        self.rng = random.Random(self.seed)
+        self.Keys = keys or (ScriptedKeys() if headless else KeyListner())
+        self.Road = Road(self.rng)
+        self.Screen = None if headless else FrameRenderer()
+        self.headless, self.render_hz, self.clock = headless, render_hz, clock
+        self.t_start = self.sim_time = 0.0
+        self.ticks = self.frames = 0
+        self.inputs = []
+        self.Road.start(self.sim_time)
 
     def process_inputs(self) -> None:
         if self.Keys.direction or self.Keys.quit:
             if self.Keys.quit:
-                print("***EXITING GAME***"), exit()
-            else:
-                self.Road.move_lane(self.Keys)
+                self.inputs.append((self.ticks, "esc"))
+                raise GameOver("quit")
+            self.inputs.append(
+                (self.ticks, "up" if "u" in self.Keys.direction else "down")
+            )
+            self.Road.move_lane(self.Keys)
 
-    def update(self) -> None:
+    def update(self, now: float) -> None:
         def update_ai() -> None:
-            self.Road.try_lvl_up(), self.Road.try_spawn(), self.Road.try_destroy()
+            self.Road.try_lvl_up(now), self.Road.try_spawn(now)
+            self.Road.try_destroy()
 
         def update_physics() -> None:
-            self.Road.flip_mid_lane(), self.Road.advance(), self.Road.check_collisions()
+            self.Road.flip_mid_lane(), self.Road.advance(now)
+            self.Road.check_collisions()
 
         update_ai(), update_physics()
 
+    def tick(self) -> None:
+        self.sim_time += self.Road.game_rules.t_per_frame
+        self.Keys.poll(self.ticks)
+        try:
+            self.process_inputs(), self.update(self.sim_time)
+        finally:
+            self.ticks += 1  # the tick that ended the game counts too
+
+    def state_digest(self) -> str:
+        road = self.Road
+        state = (
+            self.ticks,
+            round(self.sim_time, 9),
+            road.game_rules.lvl,
+            road.player_car.lane_pos,
+            road.player_car.power,
+            [(a.name, a.lane_pos, a.frame_count) for a in road.assets],
+        )
+        return hashlib.sha1(repr(state).encode()).hexdigest()
+
+    def replay(self, over=None) -> dict:
+        return {
+            "version": REPLAY_VERSION,
+            "seed": self.seed,
+            "ticks": self.ticks,
+            "inputs": self.inputs,
+            "over": over,
+            "digest": self.state_digest(),
+        }
+
     def calc_score(self, t, t_start, level) -> str:
         return str(round(round(t - t_start, 2) * level))
 
     def render(self, t, t_start) -> None:
-        run("clear")
-        buff, mid = "\n" * 2, "\t" * 3
-        print(
-            "ASCII DRIVER",
-            f"{buff*2}{mid}SCORE: {self.calc_score(t,t_start,self.Road.num_lanes)}",
-            f"LEVEL:{self.Road.game_rules.lvl}",
-            buff,
-            self.Road,
-            buff,
-            "MOVE WITH ARROW-KEYS : [↑] & [↓]",
-            "QUIT:[ESC]",
-            sep="\n",
+        self.Screen.draw(
+            compose_screen(self.Road, self.calc_score(t, t_start, self.Road.num_lanes))
         )
-        time.sleep(self.Road.game_rules.t_per_frame)
-
-    def main_game_loop(self):
-        start = time.time()
-        while True:
-            self.process_inputs(), self.update(), self.render(time.time(), start)
+        self.frames += 1
+
+    def run_headless(self, max_ticks=None) -> None:
+        # as fast as the simulation goes, game time only moves with the ticks
+        while max_ticks is None or self.ticks < max_ticks:
+            self.tick()
+
+    def main_game_loop(self, max_ticks=None):
+        if self.headless:
+            return self.run_headless(max_ticks)
+        last = next_draw = self.clock()
+        lag, drawn = 0.0, -1
+        try:
+            while max_ticks is None or self.ticks < max_ticks:
+                now = self.clock()
+                dt = self.Road.game_rules.t_per_frame
+                lag = min(lag + now - last, DEFAULT_MAX_CATCHUP_TICKS * dt)
+                last = now
+                while lag >= dt:
+                    self.tick()
+                    lag -= dt
+                    dt = self.Road.game_rules.t_per_frame  # may have leveled up
+                if now >= next_draw and drawn != self.ticks:
+                    self.render(self.sim_time, self.t_start)
+                    next_draw, drawn = now + 1 / self.render_hz, self.ticks
+                wait = dt - lag if now >= next_draw else min(dt - lag, next_draw - now)
+                if wait > 0:
+                    time.sleep(wait)
+        finally:
+            self.Screen.close()
+
+
+def play(game: Game, max_ticks=None) -> str:
+    # runs until the game ends or max_ticks, returns how it ended
+    try:
+        game.main_game_loop(max_ticks)
+    except GameOver as e:
+        return e.reason
+    return None
+
+
+def save_replay(path: str, game: Game, over: str) -> None:
+    with open(path, "w") as f:
+        json.dump(game.replay(over), f)
+
+
+def load_replay(path: str) -> dict:
+    with open(path) as f:
+        replay = json.load(f)
+    if replay.get("version") != REPLAY_VERSION:
+        raise ValueError(f"unsupported replay file: {path}")
+    return replay
+
+
+def run_replay(replay: dict) -> tuple[Game, str]:
+    game = Game(headless=True, seed=replay["seed"], keys=ScriptedKeys(replay["inputs"]))
+    over = play(game, replay["ticks"])
+    if game.state_digest() != replay["digest"] or over != replay["over"]:
+        raise ValueError(f"replay diverged at tick {game.ticks}")
+    return game, over
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ASCII DRIVER")
+    parser.add_argument("--headless", action="store_true", help="no screen or keys")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--ticks", type=int, default=None, help="stop after this many")
+    parser.add_argument("--record", default=None, help="write a replay file here")
+    parser.add_argument("--replay", default=None, help="re-run a replay file")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    Game().main_game_loop()
+    args = parse_args()
+    if args.replay:
+        game, over = run_replay(load_replay(args.replay))
+        print(f"replay matched: {game.ticks} ticks, {over or 'still running'}")
+        sys.exit()
+    game = Game(headless=args.headless, seed=args.seed)
+    over = play(game, args.ticks)
+    if args.record:
+        save_replay(args.record, game, over)
+    if not args.headless:
+        print("GAME OVER" if over == "crash" else "***EXITING GAME***")
@@ -0,0 +1,107 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+from store import BinaryStore, CsvStore, COLUMNS, epoch_day_to_date  # noqa: E402
+from journal import JournaledStore  # noqa: E402
+
+START_DAY = 19000
+
+
+def rows(n: int):
+    for i in range(n):
+        yield epoch_day_to_date(START_DAY + i), [
+            (i * 7 + k) % 101 for k in range(len(COLUMNS))
+        ]
+
+
+def csv_file(path: str) -> str:
+    with open(path, "w") as f:
+        f.write(",".join(["date"] + COLUMNS) + "\n")
+    return path
+
+
+def legacy_csv(workdir: str, n: int) -> int:
+    # what store_measurement used to do: reopen, write a blank row, no fsync
+    path = csv_file(os.path.join(workdir, "legacy.csv"))
+    for date, scores in rows(n):
+        with open(path, "a") as f:
+            writer = csv.writer(f)
+            writer.writerow([""])
+            writer.writerow([date] + scores)
+    return 0
+
+
+def per_row(store) -> callable:
+    def run(workdir: str, n: int) -> int:
+        for date, scores in rows(n):
+            store.append(date, scores)
+        return n
+
+    return run
+
+
+def journaled(store, batch_records: int, batch_ms: float) -> callable:
+    def run(workdir: str, n: int) -> int:
+        j = JournaledStore(store, store.path + ".wal", batch_records, batch_ms)
+        for date, scores in rows(n):
+            j.append(date, scores)
+        j.close()
+        return j.fsyncs
+
+    return run
+
+
+def bench(name: str, run, workdir: str, n: int) -> dict:
+    t = time.perf_counter()
+    fsyncs = run(workdir, n)
+    elapsed = time.perf_counter() - t
+    return {
+        "path": name,
+        "rows": n,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(n / elapsed, 1),
+        "fsyncs": fsyncs,
+    }
+
+
+def main(args) -> list:
+    workdir = args.data_dir or tempfile.mkdtemp(prefix="tracker_journal_")
+    csv_path = csv_file(os.path.join(workdir, "fsync.csv"))
+    cases = [
+        ("legacy csv, no fsync", legacy_csv),
+        ("csv, fsync per row", per_row(CsvStore(csv_path))),
+        (
+            "binary, fsync per row",
+            per_row(BinaryStore(os.path.join(workdir, "per_row.bin"))),
+        ),
+        (
+            f"binary + journal ({args.batch_records} rows / {args.batch_ms}ms)",
+            journaled(
+                BinaryStore(os.path.join(workdir, "journal.bin")),
+                args.batch_records,
+                args.batch_ms,
+            ),
+        ),
+    ]
+    return [bench(name, run, workdir, args.rows) for name, run in cases]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark durable appends")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-records", type=int, default=32)
+    parser.add_argument("--batch-ms", type=float, default=50)
+    parser.add_argument("--data-dir", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(parse_args()), indent=2))
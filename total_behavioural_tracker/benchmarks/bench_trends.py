@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+from store import COLUMNS  # noqa: E402
+from trends import TrendState, trend_columns  # noqa: E402
+
+START_DAY = 12000
+
+
+def synthetic_history(years: int, seed: int) -> tuple:
+    # daily entries drifting around 50 with the odd relapse stretch
+    rng = np.random.default_rng(seed)
+    n = years * 365
+    walk = np.cumsum(rng.normal(0, 3, size=(n, len(COLUMNS))), axis=0)
+    scores = np.clip(50 + walk - walk.mean(axis=0), 0, 100).astype("<i2")
+    return np.arange(START_DAY, START_DAY + n, dtype="<i4"), scores
+
+
+def timed(func, *args) -> tuple:
+    t = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - t
+
+
+def bench(years: int, cfg: dict, appends: int, seed: int) -> dict:
+    days, scores = synthetic_history(years, seed)
+    full, full_secs = timed(trend_columns, scores, cfg)
+    head = len(days) - appends
+    state, build_secs = timed(TrendState.from_columns, days[:head], scores[:head], cfg)
+    t = time.perf_counter()
+    for day, row in zip(days[head:], scores[head:]):
+        latest = state.add(day, row)
+    add_secs = (time.perf_counter() - t) / appends
+    ewm = np.array([latest[f"{c}_ewm"] for c in COLUMNS])
+    full_ewm = np.array([full[f"{c}_ewm"][-1] for c in COLUMNS])
+    return {
+        "years": years,
+        "rows": len(days),
+        "full_recompute_ms": round(full_secs * 1000, 3),
+        "state_build_ms": round(build_secs * 1000, 3),
+        "incremental_add_us": round(add_secs * 1e6, 2),
+        "speedup_per_row": round(full_secs / add_secs, 1),
+        "matches_full": bool(
+            np.allclose(ewm, full_ewm)
+            and latest["danger_streak"] == full["danger_streak"][-1]
+        ),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark tracker trend analytics")
+    parser.add_argument("--years", type=int, nargs="+", default=[10, 30, 100])
+    parser.add_argument("--appends", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--cfg",
+        default=os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            "..",
+            "src",
+            "data",
+            "app_cfg.json",
+        ),
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with open(args.cfg) as f:
+        trends_cfg = json.load(f)["util"]["trends"]
+    trend_columns(synthetic_history(1, args.seed)[1], trends_cfg)  # imports pandas
+    results = [bench(y, trends_cfg, args.appends, args.seed) for y in args.years]
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import importlib
+import statistics
+import subprocess
+import tracemalloc
+
+import numpy as np
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+SIZES = [1000, 10000, 100000, 1000000]
+# the state util keeps between calls; each is torn down only if the tree
+# under test has it, so the same harness runs against pre-series revisions
+CLOSERS = ["close_worker", "close_renderer", "close_stores"]
+MEMOS = ["_rollups", "_trends"]
+util = None
+
+
+def copy_tree(src: str, dest: str) -> None:
+    # util finds its files next to itself, so the copy's data dir is the
+    # one it reads and writes
+    shutil.copytree(
+        src, dest, ignore=shutil.ignore_patterns("__pycache__", "*.bin", "*.wal")
+    )
+
+
+def export_tree(rev: str, dest: str) -> None:
+    top, prefix = subprocess.run(
+        ["git", "rev-parse", "--show-toplevel", "--show-prefix"],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.splitlines()
+    archive = subprocess.run(
+        ["git", "archive", f"{rev}:{prefix}"], cwd=top, capture_output=True, check=True
+    ).stdout
+    os.makedirs(dest)
+    subprocess.run(["tar", "-x", "-C", dest], input=archive, check=True)
+
+
+def load_util(src: str) -> None:
+    global util
+    sys.path.insert(0, src)
+    util = importlib.import_module("util")
+
+
+def write_history(path: str, rows: int, blank_rows: bool, seed: int) -> None:
+    # program_data.csv as the app writes it, ending yesterday so that a
+    # new measurement is always valid
+    with open(path) as f:
+        header = f.readline()
+    rng = np.random.default_rng(seed)
+    yesterday = np.datetime64(datetime.date.today(), "D") - 1
+    dates = np.arange(yesterday - rows + 1, yesterday + 1)
+    months = dates.astype("datetime64[M]")
+    table = np.column_stack(
+        [
+            dates.astype("datetime64[Y]").astype(int) + 1970,
+            months.astype(int) % 12 + 1,
+            (dates - months).astype(int) + 1,
+            rng.integers(0, 101, size=(rows, header.count(","))),
+        ]
+    )
+    row_format = "%d-%d-%d" + ",%d" * header.count(",") + "\n"
+    prefix = '""\n' if blank_rows else ""  # the legacy writer's blank rows
+    with open(path, "w") as f:
+        f.write(header)
+        f.write("".join(prefix + row_format % tuple(r) for r in table.tolist()))
+
+
+def reset_util() -> None:
+    for name in CLOSERS:
+        getattr(util, name, lambda: None)()
+    for name in MEMOS:
+        if hasattr(util, name):
+            setattr(util, name, None)
+    clear_cfg_cache()
+
+
+def clear_cfg_cache() -> None:
+    # pre-series trees re-read the json on every call
+    getattr(util, "clear_cfg_cache", lambda: None)()
+
+
+def setup_data_dir(tree: str, args) -> str:
+    data_dir = os.path.join(tree, "data")
+    shutil.rmtree(data_dir, ignore_errors=True)
+    shutil.copytree(
+        os.path.join(args.src, "data"),
+        data_dir,
+        ignore=shutil.ignore_patterns("*.bin", "*.wal"),
+    )
+    cfg_file = os.path.join(data_dir, "app_cfg.json")
+    with open(cfg_file) as f:
+        cfg = json.load(f)
+    storage = cfg["util"].get("storage")
+    if storage:
+        storage["backend"] = args.backend
+        storage["journal"]["enabled"] = args.journal
+    with open(cfg_file, "w") as f:
+        json.dump(cfg, f)
+    return data_dir
+
+
+def cold_cfg():
+    clear_cfg_cache()
+    util.get_app_cfg(), util.get_program_cfg()
+
+
+def fresh_render(data_dir: str):
+    def run():
+        for name in ("program_graph.png.sha1",):
+            path = os.path.join(data_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        util.store_daily_visualization()
+
+    return run
+
+
+def measure():
+    util.store_measurement([50, 50, 50, 50, 50])
+
+
+def operations(data_dir: str, render: bool) -> list:
+    # (name, timed call, untimed setup, untimed teardown); a measurement is
+    # dropped again after each store, so every repeat sees the same history
+    ops = [
+        ("open_store", getattr(util, "get_store", None), None, None),
+        ("get_formatted_df", util.get_formatted_df, None, None),
+        ("new_entry_valid", util.new_entry_valid, None, None),
+        ("store_measurement", measure, None, util.overwrite_last_entry),
+        ("overwrite_last_entry", util.overwrite_last_entry, measure, None),
+        ("get_app_cfg", util.get_app_cfg, None, None),
+        ("get_program_cfg", util.get_program_cfg, None, None),
+        ("unconfigured_vars", util.unconfigured_vars, None, None),
+        ("cfg_cold_read", cold_cfg, None, None),
+    ]
+    if render:
+        ops.append(("store_daily_visualization", fresh_render(data_dir), None, None))
+    return [op for op in ops if op[1] is not None]
+
+
+def time_op(func, repeat: int, setup=None, teardown=None) -> dict:
+    times = []
+    for _ in range(repeat + 1):
+        if setup:
+            setup()
+        if len(times) < repeat:
+            t = time.perf_counter()
+            func()
+            times.append((time.perf_counter() - t) * 1000)
+        else:
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if teardown:
+            teardown()
+    return {
+        "median_ms": round(statistics.median(times), 4),
+        "min_ms": round(min(times), 4),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def bench_size(tree: str, rows: int, args) -> list:
+    data_dir = setup_data_dir(tree, args)
+    write_history(
+        os.path.join(data_dir, "program_data.csv"), rows, args.blank_rows, args.seed
+    )
+    reset_util()
+    results = []
+    if hasattr(util, "get_store"):
+        # the first store open includes any one-shot csv -> binary migration
+        t = time.perf_counter()
+        util.get_store()
+        results.append(
+            {
+                "rows": rows,
+                "op": "first_open",
+                "median_ms": round((time.perf_counter() - t) * 1000, 4),
+            }
+        )
+    render = args.render and rows <= args.render_max_rows
+    for name, func, setup, teardown in operations(data_dir, render):
+        timing = time_op(func, args.repeat, setup, teardown)
+        results.append({"rows": rows, "op": name, **timing})
+        print(json.dumps(results[-1]), file=sys.stderr)
+    reset_util()
+    return results
+
+
+def run_before(rev: str, argv: list, workdir: str) -> str:
+    # the earlier revision runs in its own interpreter, as both trees name
+    # their modules alike; later options override the ones in argv
+    tree, out = os.path.join(workdir, "before"), os.path.join(workdir, "before.json")
+    export_tree(rev, tree)
+    subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *argv]
+        + ["--src", tree, "--before", "", "--baseline", "", "--out", out],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return out
+
+
+def compare(results: list, baseline_file: str) -> list:
+    with open(baseline_file) as f:
+        baseline = {(r["rows"], r["op"]): r for r in json.load(f)["results"]}
+    for r in results:
+        base = baseline.get((r["rows"], r["op"]))
+        if base and base["median_ms"]:
+            r["vs_baseline"] = round(r["median_ms"] / base["median_ms"], 3)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the util.py data layer")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--backend", choices=["csv", "binary"], default="binary")
+    parser.add_argument("--journal", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--blank-rows", action="store_true", help='interleave the legacy "" rows'
+    )
+    parser.add_argument("--no-render", dest="render", action="store_false")
+    parser.add_argument("--render-max-rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--src", default=SRC, help="the src tree to benchmark")
+    parser.add_argument(
+        "--before",
+        default=None,
+        help="git revision to benchmark first and compare to, e.g. the commit "
+        "before the data layer series for the pandas read/append path",
+    )
+    parser.add_argument("--out", default=None, help="write the results json here")
+    parser.add_argument("--baseline", default=None, help="results json to compare to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> dict:
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="tracker_bench_")
+    try:
+        if args.before:
+            args.baseline = run_before(
+                args.before, sys.argv[1:] if argv is None else argv, workdir
+            )
+        tree = os.path.join(workdir, "src")
+        copy_tree(args.src, tree)
+        load_util(tree)
+        results = [r for rows in args.sizes for r in bench_size(tree, rows, args)]
+        if args.baseline:
+            results = compare(results, args.baseline)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    report = {
+        "meta": {
+            "src": os.path.abspath(args.src),
+            "before": args.before,
+            "backend": args.backend,
+            "journal": args.journal,
+            "blank_rows": args.blank_rows,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(), indent=2))
@@ -0,0 +1,50 @@
+import json
+import argparse
+from collections import defaultdict
+
+
+def span_totals(path: str) -> dict:
+    # (category, name) -> [calls, wall ms, cpu ms, allocated blocks]
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+    totals = defaultdict(lambda: [0, 0.0, 0.0, 0])
+    for e in events:
+        if e.get("ph") != "X":
+            continue
+        total = totals[(e["cat"], e["name"])]
+        total[0] += 1
+        total[1] += e["dur"] / 1000
+        total[2] += e["args"].get("cpu_ms", 0)
+        total[3] += e["args"].get("alloc_blocks", 0)
+    return totals
+
+
+def compare(base: str, new: str) -> list:
+    a, b = span_totals(base), span_totals(new)
+    rows = []
+    for key in sorted(set(a) | set(b), key=lambda k: -b.get(k, a.get(k))[1]):
+        (ca, wa, _, ma), (cb, wb, cpu, mb) = a.get(key, [0] * 4), b.get(key, [0] * 4)
+        rows.append(
+            {
+                "span": f"{key[0]}:{key[1]}",
+                "calls": [ca, cb],
+                "wall_ms": [round(wa, 2), round(wb, 2)],
+                "delta_ms": round(wb - wa, 2),
+                "cpu_ms": round(cpu, 2),
+                "alloc_blocks": [ma, mb],
+            }
+        )
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two TBT_TRACE startup traces")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    for row in compare(args.base, args.new):
+        print(json.dumps(row))
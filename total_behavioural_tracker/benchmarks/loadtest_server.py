@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+from server import TrackerServer  # noqa: E402
+
+
+async def request(reader, writer, method: str, path: str, body=None) -> tuple:
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(
+        (
+            f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n"
+        ).encode()
+        + payload
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        key, _, value = line.decode().partition(":")
+        if key.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(port: int, args, users: list, latencies: list, errors: list):
+    rng = random.Random()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for _ in range(args.requests):
+        user, roll = rng.choice(users), rng.random()
+        if roll < args.write_ratio:
+            # no date: the server files it under today, re-measuring after the
+            # first write, as random back-dated days would be rejected
+            body = {"scores": [rng.randint(0, 100) for _ in range(4)]}
+            method, path = "POST", f"/users/{user}/measurements"
+        elif roll < args.write_ratio + args.graph_ratio:
+            method, path, body = "GET", f"/users/{user}/graph.png", None
+        else:
+            method, path, body = "GET", f"/users/{user}/history", None
+        t = time.perf_counter()
+        status = await request(reader, writer, method, path, body)
+        latencies.append(time.perf_counter() - t)
+        if status >= 400:
+            errors.append(status)
+    writer.close()
+
+
+def percentile(values: list, pct: float) -> float:
+    ranked = sorted(values)
+    return ranked[min(int(len(ranked) * pct / 100), len(ranked) - 1)]
+
+
+async def run(args) -> dict:
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="tracker_load_")
+    server = TrackerServer(data_dir, args.max_users, args.connections, args.workers)
+    tcp = await server.serve("127.0.0.1", 0)
+    port = tcp.sockets[0].getsockname()[1]
+    users = [f"client{i}" for i in range(args.users)]
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[client(port, args, users, latencies, errors) for _ in range(args.connections)]
+    )
+    elapsed = time.perf_counter() - start
+    tcp.close()
+    await tcp.wait_closed()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "server": server.stats(),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the tracker server")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--max-users", type=int, default=128)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--graph-ratio", type=float, default=0.0)
+    parser.add_argument("--data-dir", default=None)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(run(parse_args())), indent=2))
@@ -3,6 +3,7 @@ from kivy.uix.boxlayout import BoxLayout
 from classes import BaseScreen, TwoButtonLayout, PageTitle, ExitButton
 from webbrowser import open_new_tab as urlopen
 from util import get_app_cfg
+from profiling import traced
 
 AboutCFG = get_app_cfg("about")
 URLS = AboutCFG["urls"]
@@ -29,6 +30,7 @@ class HyperlinkLabel(Label):
 
 
 class AboutScreen(BaseScreen):
+    @traced("screen")
     def __init__(self, app, **kwargs):
         super(AboutScreen, self).__init__(**kwargs)
         self.app = app
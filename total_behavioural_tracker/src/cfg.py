@@ -1,8 +1,17 @@
+import time
 from kivy.uix.textinput import TextInput
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.label import Label
 from util import get_app_cfg, get_program_cfg, update_var_key_data
-from classes import ExitButton, PageTitle, TwoButtonLayout, PopPrompt, BaseScreen
+from profiling import traced
+from classes import (
+    ExitButton,
+    PageTitle,
+    TwoButtonLayout,
+    PopPrompt,
+    BaseScreen,
+    FrameTimer,
+)
 
 ConfigCFG = get_app_cfg("cfg")
 GRID_LAYOUT = ConfigCFG["layout"]
@@ -26,7 +35,6 @@ class ConfigureVarKeyView(GridLayout):
         self.add_widget(self.config_label)
 
         self.config_explanation = Label(
-            text=data["ex"],
             font_size=TEXT["explanation"]["font_size"],
             italic=True,
             valign="middle",
@@ -48,6 +56,13 @@ class ConfigureVarKeyView(GridLayout):
             rfunc=self.accept_input,
         )
         self.add_widget(self.button_layout)
+        self.load(var, data)
+
+    def load(self, var, data):
+        self.var, self.data = var, data
+        self.config_label.text = var
+        self.config_explanation.text = data["ex"]
+        self.config_input.text = ""
 
     def reset_default(self, instance):
         display_txt = (
@@ -82,6 +97,7 @@ class ConfigureVarKeyView(GridLayout):
 
 
 class ConfigureScreen(BaseScreen):
+    @traced("screen")
     def __init__(self, app, var, **kwargs):
         self.app = app
         super(ConfigureScreen, self).__init__(**kwargs)
@@ -89,16 +105,26 @@ class ConfigureScreen(BaseScreen):
         self.data = get_program_cfg(self.cfg_var)
         self.vars_list = list(self.data.keys())
         self.current_var_index = 0
-        self.add_widget(self.current_cfg_view())
+        self.frame_timer = FrameTimer(f"cfg {var}")
+        key = self.vars_list[self.current_var_index]
+        self.cfg_view = ConfigureVarKeyView(
+            self.cfg_var, key, self.data[key], self, self.app
+        )
+        self.add_widget(self.cfg_view)
 
-    def current_cfg_view(self):
-        var = self.vars_list[self.current_var_index]
-        return ConfigureVarKeyView(self.cfg_var, var, self.data[var], self, self.app)
+    def on_pre_enter(self, *args):
+        # a cached screen starts over from the first key on every visit
+        if self.current_var_index:
+            self.current_var_index = 0
+            key = self.vars_list[0]
+            self.cfg_view.load(key, self.data[key])
 
     def next_screen(self):
         self.current_var_index += 1
         if not self.current_var_index < len(self.vars_list):
             self.app.switch_screen("main")
         else:
-            self.clear_widgets()
-            self.add_widget(self.current_cfg_view())
+            t = time.perf_counter()
+            key = self.vars_list[self.current_var_index]
+            self.cfg_view.load(key, self.data[key])
+            self.frame_timer.start((time.perf_counter() - t) * 1000)
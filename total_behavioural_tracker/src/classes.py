@@ -4,6 +4,9 @@ from kivy.uix.button import Button
 from kivy.uix.anchorlayout import AnchorLayout
 from kivy.uix.popup import Popup
 from kivy.uix.screenmanager import Screen
+from collections import OrderedDict
+from kivy.clock import Clock
+from kivy.logger import Logger
 from util import get_app_cfg
                        
 ClassesCFG = get_app_cfg('classes')
@@ -107,3 +110,84 @@ class TwoButtonLayout(BoxLayout):
 class BaseScreen(Screen):
     def __init__(self, **kwargs):
         super(BaseScreen, self).__init__(**kwargs)
+
+
+class ScreenRegistry(object):
+    # builds screens on first navigation, keeps at most max_screens of them
+    # and rebuilds a screen once any of its data dependencies changed
+    def __init__(self, manager, max_screens, pinned=("main",)):
+        self.manager, self.max_screens, self.pinned = manager, max_screens, pinned
+        self.factories, self.built = {}, OrderedDict()
+        self.builds = self.evictions = 0
+
+    def register(self, name, factory, deps=()):
+        # deps are callables returning a version of the data the screen shows
+        if name not in self.factories:
+            self.factories[name] = (factory, deps)
+
+    def is_registered(self, name) -> bool:
+        return name in self.factories
+
+    def versions(self, name) -> tuple:
+        return tuple(dep() for dep in self.factories[name][1])
+
+    def get(self, name):
+        self.drop_stale()
+        if name not in self.built:
+            screen = self.factories[name][0]()
+            self.manager.add_widget(screen)
+            self.built[name] = (screen, self.versions(name))
+            self.builds += 1
+        self.built.move_to_end(name)
+        self.evict(keep=name)
+        return self.built[name][0]
+
+    def drop_stale(self) -> None:
+        for name, (_, versions) in list(self.built.items()):
+            if versions != self.versions(name):
+                self.remove(name)
+
+    def evict(self, keep) -> None:
+        for name in list(self.built):
+            if len(self.built) <= self.max_screens:
+                return
+            if name not in self.pinned and name != keep:
+                self.remove(name)
+
+    def remove(self, name) -> None:
+        if name == self.manager.current:
+            return  # never pull the screen out from under the user
+        screen, _ = self.built.pop(name)
+        self.manager.remove_widget(screen)
+        self.evictions += 1
+        Logger.debug(f"Screens: evicted '{name}'")
+
+    def stats(self) -> dict:
+        return {
+            "built": list(self.built),
+            "builds": self.builds,
+            "evictions": self.evictions,
+        }
+
+
+class FrameTimer(object):
+    # logs frame times for a short window after a view transition
+    def __init__(self, name, frames=20):
+        self.name, self.frames, self.times, self.update_ms = name, frames, [], 0
+
+    def start(self, update_ms=0):
+        if not self.times:
+            Clock.schedule_interval(self.tick, 0)
+        self.times, self.update_ms = [0], update_ms
+
+    def tick(self, dt):
+        self.times.append(dt * 1000)
+        if len(self.times) <= self.frames:
+            return True
+        frames = self.times[1:]
+        Logger.debug(
+            f"FrameTime: {self.name} update {self.update_ms:.1f} ms, "
+            f"max frame {max(frames):.1f} ms, mean {sum(frames) / len(frames):.1f} ms"
+        )
+        self.times = []
+        return False
@@ -0,0 +1,132 @@
+import datetime
+import numpy as np
+from store import COLUMNS, EPOCH_ORDINAL
+
+PROGRAM_COL = COLUMNS.index("program")
+PERIODS = ("week", "month")
+
+
+def point_budget(width_px: float, plot_cfg: dict) -> int:
+    LOD = plot_cfg["lod"]
+    return max(min(int(width_px / LOD["px_per_point"]), LOD["max_points"]), 3)
+
+
+def bucket_edges(start: int, stop: int, n_buckets: int) -> np.ndarray:
+    return np.linspace(start, stop, n_buckets + 1).astype(int)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    # largest-triangle-three-buckets, always keeps the first and last point
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    edges = bucket_edges(1, size - 1, n - 2)
+    out = np.empty(n, dtype=int)
+    out[0], out[-1], a = 0, size - 1, 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nhi = edges[i + 2] if i + 2 < len(edges) else size
+        avg_x, avg_y = x[hi:nhi].mean(), y[hi:nhi].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y: np.ndarray, n: int) -> np.ndarray:
+    # min and max of each bucket, two points per bucket plus the end points
+    size = len(y)
+    if n >= size:
+        return np.arange(size)
+    if n < 4:
+        # no room for a bucket: the end points alone, still within budget
+        return np.array([0, size - 1][:max(n, 0)], dtype=int)
+    edges, keep = bucket_edges(0, size, (n - 2) // 2), [0, size - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            keep += [lo + int(y[lo:hi].argmin()), lo + int(y[lo:hi].argmax())]
+    return np.unique(keep)
+
+
+def select_indices(days, scores, n: int, method: str) -> np.ndarray:
+    y = np.asarray(scores)[:, PROGRAM_COL] if len(scores) else np.empty(0)
+    if method == "minmax":
+        return minmax_indices(y, n)
+    return lttb_indices(np.asarray(days), y, n)
+
+
+def period_key(day: int, period: str) -> int:
+    if period == "week":
+        return (int(day) + 3) // 7  # weeks start on monday
+    d = datetime.date.fromordinal(int(day) + EPOCH_ORDINAL)
+    return d.year * 12 + d.month - 1
+
+
+def period_start(key: int, period: str) -> int:
+    if period == "week":
+        return key * 7 - 3
+    return datetime.date(key // 12, key % 12 + 1, 1).toordinal() - EPOCH_ORDINAL
+
+
+class Rollups(object):
+    # per period key: [count, *score sums]; sums make add/remove O(1)
+    def __init__(self, days=(), scores=()):
+        self.buckets = {period: {} for period in PERIODS}
+        days, scores = np.asarray(days, dtype=int), np.asarray(scores, dtype=np.int64)
+        for period in PERIODS:
+            if not len(days):
+                continue
+            keys = np.array([period_key(d, period) for d in days])
+            uniq, inv = np.unique(keys, return_inverse=True)
+            sums = np.zeros((len(uniq), len(COLUMNS)), dtype=np.int64)
+            np.add.at(sums, inv, scores)
+            counts = np.bincount(inv)
+            self.buckets[period] = {
+                int(k): [int(c)] + [int(s) for s in row]
+                for k, c, row in zip(uniq, counts, sums)
+            }
+
+    def update(self, day: int, scores: list, sign: int) -> None:
+        for period in PERIODS:
+            key = period_key(day, period)
+            bucket = self.buckets[period].setdefault(key, [0] * (len(COLUMNS) + 1))
+            bucket[0] += sign
+            for i, score in enumerate(scores, start=1):
+                bucket[i] += sign * int(score)
+            if not bucket[0]:
+                del self.buckets[period][key]
+
+    def add(self, day: int, scores: list) -> None:
+        self.update(day, scores, 1)
+
+    def remove(self, day: int, scores: list) -> None:
+        self.update(day, scores, -1)
+
+    def __len__(self) -> int:
+        return len(self.buckets["week"])
+
+    def columns(self, period: str) -> tuple:
+        keys = sorted(self.buckets[period])
+        days = np.array([period_start(k, period) for k in keys], dtype="<i4")
+        stats = np.array([self.buckets[period][k] for k in keys], dtype=float)
+        if not len(keys):
+            return days, np.empty((0, len(COLUMNS)))
+        return days, np.round(stats[:, 1:] / stats[:, :1]).astype("<i2")
+
+
+def reduce_columns(days, scores, n: int, method: str, rollups=None) -> tuple:
+    # level of detail: daily rows if they fit, then weekly/monthly rollups,
+    # then lttb/minmax bucketing on whatever level is left
+    if len(days) <= n:
+        return days, scores
+    if method == "rollup" and rollups is not None:
+        for period in PERIODS:
+            days, scores = rollups.columns(period)
+            if len(days) <= n:
+                return days, scores
+        method = "lttb"
+    idx = select_indices(days, scores, n, method)
+    return np.asarray(days)[idx], np.asarray(scores)[idx]
@@ -0,0 +1,114 @@
+from kivy.uix.widget import Widget
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import (
+    Color,
+    InstructionGroup,
+    Line,
+    Rectangle,
+    PushMatrix,
+    PopMatrix,
+    Translate,
+    Scale,
+)
+from kivy.utils import colormap
+
+# same colours as plot.STYLES so both graph widgets read the same way
+SERIES_COLORS = ["magenta", "green", "yellow", "blue", "red"]
+DANGER_ZONE, MAX_PCT = 25, 100
+# vertices per Line; kivy rebuilds a line whole whenever its points change
+SEGMENT_POINTS = 256
+
+
+def split_segments(pts: list, size: int) -> list:
+    # consecutive slices sharing their end vertex, so the series stays joined
+    step = 2 * (size - 1)
+    return [pts[i : i + 2 * size] for i in range(0, max(len(pts) - 2, 1), step)]
+
+
+class CanvasLineGraph(Widget):
+    # draws the tracker series straight onto the canvas; the lines hold
+    # data coordinates (days, %) and a Translate/Scale pair maps them to
+    # the widget, so a new row only rebuilds the last segment of each series
+    def __init__(self, plot_cfg, **kwargs):
+        super(CanvasLineGraph, self).__init__(**kwargs)
+        self.cfg, WARN = plot_cfg, plot_cfg["warning"]
+        self.days, self.last_scores = [], None
+        with self.canvas:
+            Color(*colormap[WARN["color"]][:3], WARN["opacity"])
+            self.band = Rectangle()
+            PushMatrix()
+            self.translate, self.scale = Translate(), Scale()
+            self.groups, self.segments = [], []
+            for color in SERIES_COLORS:
+                Color(*colormap[color])
+                self.groups.append(InstructionGroup())
+                self.segments.append([])
+            PopMatrix()
+            Color(1, 1, 1, 1)
+            self.warn_label = self.create_text(
+                "Relapse Danger Zone", WARN["canvas_font_size"]
+            )
+        self.bind(pos=self.update_transform, size=self.update_transform)
+
+    def create_text(self, text, font_size):
+        label = CoreLabel(text=text, font_size=font_size, italic=True)
+        label.refresh()
+        return Rectangle(texture=label.texture, size=label.texture.size)
+
+    def load(self, days, scores) -> None:
+        self.days = [int(d) for d in days]
+        for i, group in enumerate(self.groups):
+            pts = []
+            for day, row in zip(self.days, scores):
+                pts += [day - self.days[0], int(row[i])]
+            group.clear()
+            self.segments[i] = [
+                Line(points=p) for p in split_segments(pts, SEGMENT_POINTS)
+            ]
+            for line in self.segments[i]:
+                group.add(line)
+        self.last_scores = [int(i) for i in scores[-1]] if len(self.days) else None
+        self.update_transform()
+
+    def append_row(self, day, scores) -> None:
+        if not self.days:
+            return self.load([day], [scores])
+        self.days.append(int(day))
+        for group, segments, score in zip(self.groups, self.segments, scores):
+            point, last = [int(day) - self.days[0], int(score)], segments[-1]
+            if len(last.points) < 2 * SEGMENT_POINTS:
+                last.points = last.points + point
+            else:
+                segments.append(Line(points=last.points[-2:] + point))
+                group.add(segments[-1])
+        self.last_scores = [int(i) for i in scores]
+        self.update_transform()
+
+    def tail_matches(self, days, scores, n: int) -> bool:
+        return (
+            bool(n)
+            and len(days) >= n
+            and int(days[n - 1]) == self.days[-1]
+            and [int(i) for i in scores[n - 1]] == self.last_scores
+        )
+
+    def sync(self, days, scores) -> None:
+        # append when the data only grew, reload on any other change
+        n = len(self.days)
+        if self.tail_matches(days, scores, n):
+            for day, row in zip(days[n:], scores[n:]):
+                self.append_row(day, row)
+        elif n or len(days):
+            self.load(days, scores)
+
+    def update_transform(self, *args) -> None:
+        span = max(self.days[-1] - self.days[0], 1) if self.days else 1
+        sx, sy = self.width / span, self.height / MAX_PCT
+        self.translate.xy = self.x, self.y
+        self.scale.x, self.scale.y = sx, sy
+        self.band.pos, self.band.size = self.pos, (self.width, DANGER_ZONE * sy)
+        self.warn_label.pos = (
+            self.x + self.cfg["warning"]["offset_dist"] * self.width
+            - self.warn_label.size[0] / 2,
+            self.y + (DANGER_ZONE * sy - self.warn_label.size[1]) / 2,
+        )
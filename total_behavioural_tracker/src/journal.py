@@ -0,0 +1,213 @@
+import os
+import time
+import zlib
+import struct
+import threading
+from store import COLUMNS, date_to_epoch_day, epoch_day_to_date
+
+WAL_MAGIC, WAL_VERSION = b"TBTJ", 1
+WAL_HEADER = struct.Struct("<4sH")
+# op, rows in the store once the op is applied, epoch day, scores
+WAL_BODY = struct.Struct(f"<BIi{len(COLUMNS)}h")
+WAL_CRC = struct.Struct("<I")
+WAL_RECORD_SIZE = WAL_BODY.size + WAL_CRC.size
+OP_APPEND, OP_REPLACE_LAST = 0, 1
+
+
+def pack_record(op: int, rows_after: int, day: int, scores: list) -> bytes:
+    body = WAL_BODY.pack(op, rows_after, day, *[int(i) for i in scores])
+    return body + WAL_CRC.pack(zlib.crc32(body))
+
+
+def read_records(f) -> list:
+    # every intact record; reading stops at the first torn or corrupt one
+    f.seek(WAL_HEADER.size)
+    records = []
+    while True:
+        raw = f.read(WAL_RECORD_SIZE)
+        if len(raw) < WAL_RECORD_SIZE:
+            break
+        body, (crc,) = raw[: WAL_BODY.size], WAL_CRC.unpack(raw[WAL_BODY.size :])
+        if zlib.crc32(body) != crc:
+            break
+        op, rows_after, day, *scores = WAL_BODY.unpack(body)
+        records.append((op, rows_after, day, scores))
+    return records
+
+
+class JournaledStore(object):
+    # write-ahead journal in front of a store: appends are buffered and
+    # fsynced in groups, then checkpointed into the store in one batch
+    def __init__(
+        self,
+        store,
+        wal_path,
+        batch_records: int = 32,
+        batch_ms: float = 50,
+        checkpoint_records: int = 1024,
+    ):
+        self.store, self.path, self.name = store, str(wal_path), store.name
+        self.batch_records, self.batch_secs = batch_records, batch_ms / 1000
+        self.checkpoint_records = checkpoint_records
+        self.cond = threading.Condition()
+        self.unsynced, self.deadline, self.journaled = [], 0, 0
+        self.fsyncs = self.closed = 0
+        self.tail = None
+        self.wal = self.open_wal()
+        self.recover()
+        self.n_rows = len(self.store)
+        self.committer = threading.Thread(
+            target=self.run_committer, name="wal-commit", daemon=True
+        )
+        self.committer.start()
+
+    def open_wal(self):
+        if (
+            not os.path.exists(self.path)
+            or os.path.getsize(self.path) < WAL_HEADER.size
+        ):
+            with open(self.path, "wb") as f:
+                f.write(WAL_HEADER.pack(WAL_MAGIC, WAL_VERSION))
+                f.flush(), os.fsync(f.fileno())
+        wal = open(self.path, "r+b")
+        if WAL_HEADER.unpack(wal.read(WAL_HEADER.size)) != (WAL_MAGIC, WAL_VERSION):
+            wal.close()
+            raise ValueError(f"unsupported journal: {self.path}")
+        return wal
+
+    def recover(self) -> int:
+        # replay whatever the last run journaled but never checkpointed
+        with self.cond:
+            return self.checkpoint_locked(force=True)
+
+    def journal(self, op: int, date: str, scores: list) -> None:
+        with self.cond:
+            self.n_rows += op == OP_APPEND
+            day = date_to_epoch_day(date)
+            record = pack_record(op, self.n_rows, day, scores)
+            self.tail = day, [int(i) for i in scores]
+            if not self.unsynced:
+                self.deadline = time.monotonic() + self.batch_secs
+                self.cond.notify()
+            self.unsynced.append(record)
+            if len(self.unsynced) >= self.batch_records:
+                self.commit_locked()
+            if self.journaled >= self.checkpoint_records:
+                self.checkpoint_locked()
+
+    def append(self, date: str, scores: list) -> None:
+        self.journal(OP_APPEND, date, scores)
+
+    def replace_last(self, date: str, scores: list) -> None:
+        if not self.n_rows:
+            return self.append(date, scores)
+        self.journal(OP_REPLACE_LAST, date, scores)
+
+    def commit_locked(self) -> None:
+        if not self.unsynced:
+            return
+        self.wal.seek(0, os.SEEK_END)
+        self.wal.write(b"".join(self.unsynced))
+        self.wal.flush(), os.fsync(self.wal.fileno())
+        self.journaled += len(self.unsynced)
+        self.fsyncs += 1
+        self.unsynced = []
+
+    def commit(self) -> None:
+        with self.cond:
+            self.commit_locked()
+
+    def run_committer(self) -> None:
+        with self.cond:
+            while not self.closed:
+                if not self.unsynced:
+                    self.cond.wait()
+                    continue
+                remaining = self.deadline - time.monotonic()
+                if remaining > 0:
+                    self.cond.wait(remaining)
+                    continue
+                self.commit_locked()
+
+    def checkpoint_locked(self, force: bool = False) -> int:
+        self.commit_locked()
+        if not (self.journaled or force):
+            return 0
+        records = read_records(self.wal)
+        applied = self.apply(records)
+        # the store is durable before the journal is cut back to its header
+        self.wal.truncate(WAL_HEADER.size)
+        self.wal.flush(), os.fsync(self.wal.fileno())
+        self.journaled = 0
+        return applied
+
+    def checkpoint(self) -> int:
+        with self.cond:
+            return self.checkpoint_locked()
+
+    def apply(self, records: list) -> int:
+        # ops that are already in the store (a checkpoint cut short before
+        # the journal was truncated) are recognised by their row count
+        rows, days, scores, applied = len(self.store), [], [], 0
+        for op, rows_after, day, row in records:
+            if rows_after < rows or (op == OP_APPEND and rows_after == rows):
+                continue
+            applied += 1
+            if op == OP_APPEND:
+                days.append(day), scores.append(row)
+                rows += 1
+                continue
+            self.flush_appends(days, scores)
+            days, scores = [], []
+            self.store.replace_last(epoch_day_to_date(day), row)
+        self.flush_appends(days, scores)
+        return applied
+
+    def flush_appends(self, days: list, scores: list) -> None:
+        if not days:
+            return
+        if hasattr(self.store, "append_days"):
+            self.store.append_days(days, scores)
+            return
+        for day, row in zip(days, scores):
+            self.store.append(epoch_day_to_date(day), row)
+
+    def append_days(self, days, scores) -> None:
+        for day, row in zip(days, scores):
+            self.append(epoch_day_to_date(day), row)
+
+    # reads and rare edits see the store only after the journal is applied
+    def drop_last(self) -> None:
+        with self.cond:
+            self.checkpoint_locked()
+            self.store.drop_last()
+            self.n_rows, self.tail = len(self.store), None
+
+    def last(self):
+        if self.tail is not None:
+            return self.tail
+        self.checkpoint()
+        return self.store.last()
+
+    def frame(self):
+        self.checkpoint()
+        return self.store.frame()
+
+    def columns(self) -> tuple:
+        self.checkpoint()
+        return self.store.columns()
+
+    def rows(self):
+        self.checkpoint()
+        return self.store.rows()
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def close(self) -> None:
+        with self.cond:
+            self.checkpoint_locked()
+            self.closed = 1
+            self.cond.notify()
+        self.committer.join()
+        self.wal.close()
@@ -0,0 +1,73 @@
+import sys
+import time
+import importlib
+from importlib.abc import MetaPathFinder
+
+IMPORT_TIMES = {}
+
+
+def timed_import(name: str):
+    module = sys.modules.get(name)
+    if module is None:
+        t = time.perf_counter()
+        module = importlib.import_module(name)
+        IMPORT_TIMES.setdefault(name, time.perf_counter() - t)
+    return module
+
+
+class LazyModule(object):
+    # stands in for a heavy module until one of its attributes is needed
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+
+    def __getattr__(self, attr: str):
+        return getattr(timed_import(self._name), attr)
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+class TimedLoader(object):
+    def __init__(self, loader, name: str):
+        self.loader, self.name = loader, name
+
+    def __getattr__(self, attr: str):
+        return getattr(self.loader, attr)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        t = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            IMPORT_TIMES.setdefault(self.name, time.perf_counter() - t)
+
+
+class ImportTimer(MetaPathFinder):
+    # records the inclusive import time of every top-level module
+    def find_spec(self, fullname, path, target=None):
+        if "." in fullname:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if hasattr(spec.loader, "exec_module"):
+                spec.loader = TimedLoader(spec.loader, fullname)
+            return spec
+        return None
+
+
+def install_import_timer() -> None:
+    if not any(isinstance(i, ImportTimer) for i in sys.meta_path):
+        sys.meta_path.insert(0, ImportTimer())
+
+
+def import_report(limit: int = 15) -> list:
+    ranked = sorted(IMPORT_TIMES.items(), key=lambda x: x[1], reverse=True)
+    return [f"{name}: {secs * 1000:.1f} ms" for name, secs in ranked[:limit]]
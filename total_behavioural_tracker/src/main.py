@@ -1,33 +1,52 @@
+from lazy import install_import_timer, import_report, IMPORT_TIMES
+
+install_import_timer()
+
 import os
 import shutil
 from pathlib import Path
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.uix.button import Button
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.image import Image
 from kivy.uix.screenmanager import ScreenManager
 from kivy.uix.dropdown import DropDown
 from kivy.resources import resource_add_path
+from kivy.logger import Logger
 from util import (
     get_program_cfg,
     get_app_cfg,
     get_img_file,
+    get_graph_data,
+    graph_uses_image,
     unconfigured_vars,
-    store_daily_visualization,
     new_entry_valid,
     overwrite_last_entry,
+    get_cfg_cache_stats,
+    data_version,
+    close_renderer,
+    close_stores,
+    close_worker,
+    queue_render,
+    run_in_background,
 )
-from classes import PageTitle, PopPrompt, BaseScreen, OneButtonPopup
+from classes import PageTitle, PopPrompt, BaseScreen, OneButtonPopup, ScreenRegistry
 from cfg import ConfigureScreen
 from measure import ProgramMeasurementScreen
 from about import AboutScreen
+from graph import CanvasLineGraph
+from profiling import span, instant, traced, tracing, write_trace
+from worker import UI_BLOCKING, ui_blocking
 
 
 ProgramCFG = get_program_cfg()
 MCFG = get_app_cfg("main")
 MBUTTONS = MCFG["buttons"]
+SCREENS = MCFG["screens"]
 DROPDOWN = MCFG["dropdown"]
 ABOUT = MCFG["about"]
+PLOT = get_app_cfg("util")["plot"]
 
 
 class VariableButton(Button):
@@ -42,11 +61,7 @@ class VariableButton(Button):
         self.bind(on_release=self.configure_variable)
 
     def configure_variable(self, instance):
-        cfg_screen_name = f"cfg_{self.text}"
-        self.app.screen_manager.add_widget(
-            ConfigureScreen(name=cfg_screen_name, app=self.app, var=self.text)
-        )
-        self.app.switch_screen(cfg_screen_name)
+        self.app.configure_screen(self.text)
         self.dropdown.dismiss()
 
 
@@ -76,6 +91,19 @@ class MainLineGraph(Image):
         self.source = str(get_img_file())
         self.reload()
 
+    def refresh(self):
+        self.reload_img()
+
+
+class MainCanvasGraph(CanvasLineGraph):
+    def __init__(self, **kwargs):
+        super(MainCanvasGraph, self).__init__(PLOT, **kwargs)
+        self.bind(width=lambda *args: self.refresh())
+        self.refresh()
+
+    def refresh(self):
+        self.sync(*get_graph_data(self.width))
+
 
 class MainButtonLayout(BoxLayout):
     def __init__(self, app, **kwargs):
@@ -117,6 +145,7 @@ class MainButtonLayout(BoxLayout):
         )
         dropdown.open(self.configure_button)
 
+    @ui_blocking("measure button")
     def measure_prgrm(self, instance):
         fully_configured = not unconfigured_vars()
         if new_entry_valid() and fully_configured:
@@ -140,9 +169,10 @@ class MainButtonLayout(BoxLayout):
             nfunc=self.on_cancel,
         )
 
+    @ui_blocking("confirm overwrite")
     def on_confirm(self, instance):
         self.popup.dismiss()
-        overwrite_last_entry()
+        run_in_background(overwrite_last_entry)
         self.start_measurement()
 
     def on_cancel(self, instance):
@@ -155,27 +185,34 @@ class MainPageLayout(BoxLayout):
         self.app = app
         self.orientation = "vertical"
         self.app_title = PageTitle(text="Total Behavioural Tracker")
-        self.linegraph, self.main_buttons = MainLineGraph(), MainButtonLayout(self.app)
+        self.linegraph = MainLineGraph() if graph_uses_image() else MainCanvasGraph()
+        self.main_buttons = MainButtonLayout(self.app)
         self.add_widget(self.app_title)
         self.add_widget(self.linegraph)
         self.add_widget(self.main_buttons)
 
 
 class MainScreen(BaseScreen):
+    @traced("screen")
     def __init__(self, app, **kwargs):
         super(MainScreen, self).__init__(**kwargs)
         self.app = app
-        store_daily_visualization()
+        # the cached graph is shown as-is and checked against the store off
+        # the UI thread, as it is again once a measurement finishes
         self.main_page_layout = MainPageLayout(self.app)
         self.add_widget(self.main_page_layout)
+        if graph_uses_image():
+            queue_render(on_rendered=self.main_page_layout.linegraph.refresh)
 
 
 class MyApp(App):
     def __init__(self):
-        super(MyApp, self).__init__()
-        self.setup_local_data()
-        self.setup_application_screens()
+        with span("MyApp.__init__", "startup"):
+            super(MyApp, self).__init__()
+            self.setup_local_data()
+            self.setup_application_screens()
 
+    @traced("startup")
     def setup_local_data(self):
         self.dat_dir = os.path.join(self.user_data_dir, "data")
         os.makedirs(self.dat_dir, exist_ok=True)
@@ -188,25 +225,68 @@ class MyApp(App):
                 shutil.copy(src_file, dst_file)
         resource_add_path(self.dat_dir)
 
+    @traced("startup")
     def setup_application_screens(self):
-        self.main_screen = MainScreen(name="main", app=self)
-        self.about_screen = AboutScreen(name="about", app=self)
-        self.measure_screen = ProgramMeasurementScreen(name="measure", app=self)
+        self.screen_manager = ScreenManager()
+        self.screens = ScreenRegistry(self.screen_manager, SCREENS["max_cached"])
+        self.screens.register("main", lambda: MainScreen(name="main", app=self))
+        self.screens.register("about", lambda: AboutScreen(name="about", app=self))
+        self.screens.register(
+            "measure",
+            lambda: ProgramMeasurementScreen(name="measure", app=self),
+            deps=(lambda: data_version("program_cfg.json"),),
+        )
+        # only the main screen is needed for the first frame
+        self.main_screen = self.screens.get("main")
+
+    def configure_screen(self, var):
+        name = f"cfg_{var}"
+        self.screens.register(
+            name,
+            lambda: ConfigureScreen(name=name, app=self, var=var),
+            deps=(lambda: data_version("program_cfg.json"),),
+        )
+        self.switch_screen(name)
+
+    def on_start(self):
+        for line in import_report():
+            Logger.info(f"Startup: import {line}")
+        if tracing():
+            ms = {name: round(secs * 1000, 3) for name, secs in IMPORT_TIMES.items()}
+            instant("imports", "startup", **ms)
+            Clock.schedule_once(self.on_first_frame, 0)
+
+    def on_first_frame(self, dt):
+        instant("first_frame", "startup")
+        Logger.info(f"Startup: trace written to {write_trace()}")
+
+    def refresh_graph(self):
+        self.main_screen.main_page_layout.linegraph.refresh()
+
+    def on_stop(self):
+        close_worker()
+        close_renderer()
+        close_stores()
+        for name, (count, total, worst) in UI_BLOCKING.items():
+            Logger.info(
+                f"UiBlock: {name} x{count}, mean {total / count:.1f} ms, max {worst:.1f} ms"
+            )
+        write_trace()
 
+    @traced("startup")
     def build(self):
-        self.screen_manager = ScreenManager()
-        self.screen_manager.add_widget(self.main_screen)
-        self.screen_manager.add_widget(self.about_screen)
-        self.screen_manager.add_widget(self.measure_screen)
         self.screen_manager.current = "main"
         return self.screen_manager
 
     def switch_screen(self, screen_name):
         if screen_name == "main":
             self.screen_manager.transition.direction = "right"
-            self.main_screen.main_page_layout.linegraph.reload_img()
+            self.refresh_graph()
         self.screen_manager.transition.direction = "left"
+        self.screens.get(screen_name)
         self.screen_manager.current = screen_name
+        Logger.debug(f"Config: cache after '{screen_name}' {get_cfg_cache_stats()}")
+        Logger.debug(f"Screens: {self.screens.stats()}")
 
 
 if __name__ == "__main__":
@@ -1,13 +1,13 @@
+import time
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.label import Label
-from classes import TwoButtonLayout, ExitButton, BaseScreen
+from classes import TwoButtonLayout, ExitButton, BaseScreen, FrameTimer
+from profiling import traced
+from worker import ui_blocking
 from util import (
     get_app_cfg,
     normalize_as_pct,
-    will_power,
-    pos_reinforcement,
-    neg_reinforcement,
-    obsession,
+    get_questionnaire,
     update_reccords,
 )
 MeasureCFG = get_app_cfg('measure')
@@ -20,19 +20,11 @@ class QuestionView(GridLayout):
         super(QuestionView, self).__init__(**kwargs)
         self.measurer = measurer
         self.app = app
-        self.var = self.measurer.vars[self.measurer.var_index]
         self.cols, self.rows = PAGE_LAYOUT
-        # Catch non-configed files, on fresh app
-        self.question = (
-            self.var.questions[self.measurer.q_index]
-            if self.var.questions
-            else "NO QUESTION"
-        )
         self.exit = ExitButton(application=self.app)
         self.add_widget(self.exit.layout, index=0)
 
         self.question_label = Label(
-            text=self.question,
             font_size=QUESTION["font_size"],
             halign="center",
             valign="middle",
@@ -47,11 +39,24 @@ class QuestionView(GridLayout):
             rtxt="YES", rfunc=self.on_yes, ltxt="NO", lfunc=self.on_no
         )
         self.add_widget(self.buttons_layout)
+        self.show_question()
+
+    def show_question(self):
+        self.var = self.measurer.vars[self.measurer.var_index]
+        # Catch non-configed files, on fresh app
+        self.question = (
+            self.var.questions[self.measurer.q_index]
+            if self.var.questions
+            else "NO QUESTION"
+        )
+        self.question_label.text = self.question
 
+    @ui_blocking("measure answer")
     def on_yes(self, instance):
         self.var.add_score(1)
         self.measurer.next_screen()
 
+    @ui_blocking("measure answer")
     def on_no(self, instance):
         self.measurer.next_screen()
 
@@ -61,6 +66,9 @@ class VarMeasurer:
         self.questions, self.score = questions, 0
         self.n = len(questions)
 
+    def reset(self):
+        self.score = 0
+
     def add_score(self, score):
         self.score += score
 
@@ -69,24 +77,31 @@ class VarMeasurer:
 
 
 class ProgramMeasurementScreen(BaseScreen):
+    @traced("screen")
     def __init__(self, app, **kwargs):
         super(ProgramMeasurementScreen, self).__init__(**kwargs)
         self.app = app
-        self.wp = VarMeasurer(will_power())
-        self.o = VarMeasurer(obsession())
-        self.nr = VarMeasurer(neg_reinforcement())
-        self.pr = VarMeasurer(pos_reinforcement())
+        questionnaire = get_questionnaire()
+        self.vars = [
+            VarMeasurer(questionnaire.var_questions(var))
+            for var in questionnaire.var_names
+        ]
+        self.wp, self.nr, self.o, self.pr = self.vars
+        self.q_index = self.var_index = 0
+        self.frame_timer = FrameTimer("measure")
+        self.question_view = QuestionView(measurer=self, app=self.app)
+        self.add_widget(self.question_view)
 
-        self.vars = [self.wp, self.nr, self.o, self.pr]
+    def on_pre_enter(self, *args):
+        # every visit starts a fresh measurement on the same view
+        list(map(lambda x: x.reset(), self.vars))
         self.q_index = self.var_index = 0
-        self.add_widget(self.current_question_view())
+        self.question_view.show_question()
 
     def clear_to_next_question(self):
-        self.clear_widgets()
-        self.add_widget(self.current_question_view())
-
-    def current_question_view(self):
-        return QuestionView(measurer=self, app=self.app)
+        t = time.perf_counter()
+        self.question_view.show_question()
+        self.frame_timer.start((time.perf_counter() - t) * 1000)
 
     def next_var(self):
         self.var_index += 1
@@ -95,7 +110,7 @@ class ProgramMeasurementScreen(BaseScreen):
     def process_questions(self):
         wp, nr, o, pr = list(map(lambda x: x.norm_score(), self.vars))
         program = normalize_as_pct(wp + nr - (o - pr), -100, 400)
-        update_reccords([wp, nr, o, pr, program])
+        update_reccords([wp, nr, o, pr, program], on_rendered=self.app.refresh_graph)
 
     def next_screen(self):
         self.q_index += 1
@@ -0,0 +1,140 @@
+import os
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from downsample import point_budget, reduce_columns
+from store import columns_hash, read_hash
+
+STYLES = ["ms-", "go-", "y^-", "bs-", "rs-"]
+NS_PER_DAY = 86400 * 10**9
+
+
+def get_warn_index(df_index, offset_dist: float):
+    min_date, max_date = min(df_index), max(df_index)
+    return min_date + (offset_dist * (max_date - min_date))
+
+
+def frame_hash(df: pd.DataFrame) -> str:
+    # the same digest as the store's columns, in days
+    return columns_hash(df.index.asi8 // NS_PER_DAY, df.to_numpy(), list(df.columns))
+
+
+def reduce_frame(df: pd.DataFrame, n: int, method: str, rollups=None) -> pd.DataFrame:
+    if len(df) <= n:
+        return df
+    days, scores = reduce_columns(
+        df.index.asi8 // NS_PER_DAY, df.to_numpy(), n, method, rollups
+    )
+    index = pd.to_datetime(np.asarray(days, dtype="i8"), unit="D")
+    index.name = df.index.name
+    return pd.DataFrame(scores, columns=df.columns, index=index)
+
+
+class GraphRenderer(object):
+    # keeps one Figure/Axes alive and only appends new rows to its lines
+    def __init__(self, plot_cfg: dict):
+        self.cfg = plot_cfg
+        self.fig = self.ax = None
+        self.xs, self.ys, self.lines = [], [], []
+        self.trend_line = None
+
+    def setup(self) -> None:
+        WARN, AXES = self.cfg["warning"], self.cfg["axes"]
+        sns.set_theme(context="notebook", style="darkgrid", palette="muted")
+        self.fig = Figure()
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        locator = AutoDateLocator()
+        self.ax.xaxis.set_major_locator(locator)
+        self.ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+        self.band = self.ax.axhspan(
+            ymin=0, ymax=25, color=WARN["color"], alpha=WARN["opacity"], visible=False
+        )
+        self.warn = self.ax.text(
+            x=0,
+            y=15,
+            s="Relapse Danger Zone",
+            fontsize=WARN["font_size"],
+            va="center",
+            ha="center",
+            visible=False,
+        )
+        self.ax.set_xlabel("Time", fontsize=AXES["font_size"])
+        self.ax.set_ylabel("Total % Value", fontsize=AXES["font_size"])
+        self.ax.tick_params(axis="x", labelsize=AXES["tick_font_size"])
+        self.ax.tick_params(axis="y", labelsize=AXES["tick_font_size"])
+
+    def create_lines(self, columns: list) -> None:
+        LEG = self.cfg["legend"]
+        self.ys = [[] for _ in columns]
+        self.lines = [
+            self.ax.plot([], [], style, label=col)[0]
+            for col, style in zip(columns, STYLES)
+        ]
+        self.ax.legend(loc=LEG["loc"], fontsize=LEG["font_size"])
+
+    def is_extension(self, df: pd.DataFrame) -> bool:
+        n = len(self.xs)
+        if not n or len(df) < n or df.index[n - 1] != self.xs[-1]:
+            return False
+        return list(df.iloc[n - 1]) == [y[-1] for y in self.ys]
+
+    def update(self, df: pd.DataFrame) -> None:
+        if not self.lines:
+            self.create_lines(list(df.columns))
+        start = len(self.xs) if self.is_extension(df) else 0
+        if not start:
+            self.xs, self.ys = [], [[] for _ in self.lines]
+        new = df.iloc[start:]
+        self.xs += list(new.index)
+        for y, col in zip(self.ys, new.columns):
+            y += new[col].tolist()
+        for line, y in zip(self.lines, self.ys):
+            line.set_data(self.xs, y)
+
+    def update_trend(self, trends, budget: int) -> None:
+        if self.trend_line is None:
+            self.trend_line = self.ax.plot([], [], "k--", label="program trend")[0]
+            LEG = self.cfg["legend"]
+            self.ax.legend(loc=LEG["loc"], fontsize=LEG["font_size"])
+        days, values = trends.overlay(budget)
+        self.trend_line.set_data(pd.to_datetime(days, unit="D"), values)
+
+    def width_px(self) -> float:
+        return self.fig.get_figwidth() * self.fig.dpi
+
+    def draw(self, df: pd.DataFrame, rollups=None, trends=None) -> None:
+        if self.fig is None:
+            self.setup()
+        budget = point_budget(self.width_px(), self.cfg)
+        df = reduce_frame(df, budget, self.cfg["lod"]["method"], rollups)
+        if not df.empty:
+            self.update(df)
+            if trends is not None:
+                self.update_trend(trends, budget)
+            self.warn.set_x(get_warn_index(df.index, self.cfg["warning"]["offset_dist"]))
+            self.ax.relim(), self.ax.autoscale_view()
+        self.band.set_visible(not df.empty), self.warn.set_visible(not df.empty)
+
+    def render(
+        self, df: pd.DataFrame, img_file, rollups=None, trends=None, digest=None
+    ) -> bool:
+        hash_file = f"{img_file}.sha1"
+        if digest is None:
+            digest = frame_hash(df) + ("+trend" if trends is not None else "")
+        if os.path.exists(img_file) and read_hash(hash_file) == digest:
+            return False
+        self.draw(df, rollups, trends)
+        self.fig.savefig(img_file)
+        with open(hash_file, "w") as f:
+            f.write(digest)
+        return True
+
+    def close(self) -> None:
+        if self.fig is not None:
+            self.fig.clear()
+        self.fig = self.ax = self.trend_line = None
+        self.xs, self.ys, self.lines = [], [], []
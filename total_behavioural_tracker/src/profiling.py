@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import functools
+from contextlib import contextmanager, nullcontext
+
+# TBT_TRACE=<file> records a chrome trace-event file (chrome://tracing,
+# ui.perfetto.dev); without it every hook below is a no-op
+TRACE_ENV = "TBT_TRACE"
+
+
+class Tracer(object):
+    # complete ("X") events with wall time, thread cpu time and the
+    # change in allocated memory blocks over each span
+    def __init__(self, path: str):
+        self.path, self.t0 = path, time.perf_counter()
+        self.pid, self.events, self.threads = os.getpid(), [], set()
+        self.lock = threading.Lock()
+
+    def now_us(self) -> float:
+        return (time.perf_counter() - self.t0) * 1e6
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args):
+        ts, cpu, blocks = self.now_us(), time.thread_time(), sys.getallocatedblocks()
+        try:
+            yield
+        finally:
+            args.update(
+                cpu_ms=round((time.thread_time() - cpu) * 1000, 3),
+                alloc_blocks=sys.getallocatedblocks() - blocks,
+            )
+            self.add(
+                {
+                    "name": name,
+                    "cat": cat,
+                    "ph": "X",
+                    "ts": ts,
+                    "dur": self.now_us() - ts,
+                },
+                args,
+            )
+
+    def instant(self, name: str, cat: str, **args) -> None:
+        self.add(
+            {"name": name, "cat": cat, "ph": "i", "s": "p", "ts": self.now_us()}, args
+        )
+
+    def add(self, event: dict, args: dict) -> None:
+        thread = threading.current_thread()
+        event.update(pid=self.pid, tid=thread.ident, args=args)
+        with self.lock:
+            self.events.append(event)
+            if thread.ident in self.threads:
+                return
+            self.threads.add(thread.ident)
+            self.events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self.pid,
+                    "tid": thread.ident,
+                    "args": {"name": thread.name},
+                }
+            )
+
+    def write(self) -> str:
+        with self.lock:
+            events = list(self.events)
+        trace = {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+            },
+        }
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(trace, f)
+        os.replace(tmp, self.path)
+        return self.path
+
+
+TRACER = Tracer(os.environ[TRACE_ENV]) if os.environ.get(TRACE_ENV) else None
+
+
+def tracing() -> bool:
+    return TRACER is not None
+
+
+def span(name: str, cat: str = "app", **args):
+    return TRACER.span(name, cat, **args) if TRACER else nullcontext()
+
+
+def instant(name: str, cat: str = "app", **args) -> None:
+    if TRACER:
+        TRACER.instant(name, cat, **args)
+
+
+def traced(cat: str):
+    # wraps only when tracing, so untraced runs call the function directly
+    def wrap(func):
+        if TRACER is None:
+            return func
+
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            with TRACER.span(func.__qualname__, cat):
+                return func(*args, **kwargs)
+
+        return run
+
+    return wrap
+
+
+def write_trace():
+    return TRACER.write() if TRACER else None
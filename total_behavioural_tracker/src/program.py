@@ -0,0 +1,114 @@
+import os
+import json
+
+PROGRAM_CFG_SCHEMA = 1
+
+
+class ProgramConfig(object):
+    # program_cfg.json plus a log of per-section edits made since it was
+    # last written; derived state is kept up to date on every edit
+    def __init__(self, base: dict, log_path, compact_after: int = 32):
+        self.base, self.data = base, base
+        self.log_path, self.compact_after = str(log_path), compact_after
+        self.sections = [(var, key) for var in base for key in base[var]]
+        self.index = {section: i for i, section in enumerate(self.sections)}
+        self.all_bits = (1 << len(self.sections)) - 1
+        self.configured = sum(
+            1 << i
+            for i, (var, key) in enumerate(self.sections)
+            if base[var][key]["user"]
+        )
+        self.counts = {
+            var: sum(len(s["user"]) for s in sections.values())
+            for var, sections in base.items()
+        }
+        self.dirty, self.version, self.deltas = 0, 0, 0
+        self.replay()
+
+    def read_log(self) -> tuple:
+        if not os.path.exists(self.log_path):
+            return None, []
+        header, deltas, good = None, [], 0
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn last line
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                good += len(line)
+                if header is None:
+                    header = entry
+                else:
+                    deltas.append(entry)
+        if good < os.path.getsize(self.log_path):
+            # cut the fragment off, or the next delta is appended onto it
+            os.truncate(self.log_path, good)
+        return header, deltas
+
+    def replay(self) -> None:
+        header, deltas = self.read_log()
+        if header is None:
+            self.write_header()
+            return
+        if header.get("schema") != PROGRAM_CFG_SCHEMA:
+            raise ValueError(f"unsupported program cfg log: {self.log_path}")
+        for delta in deltas:
+            # edits to sections that no longer exist, or that the base file
+            # already holds (a compaction cut short), change nothing
+            section = (delta["var"], delta["key"])
+            if (
+                section in self.index
+                and self.data[section[0]][section[1]]["user"] != delta["user"]
+            ):
+                self.apply(delta["var"], delta["key"], delta["user"])
+        self.version, self.deltas = header["version"] + len(deltas), len(deltas)
+
+    def write_header(self) -> None:
+        with open(self.log_path, "w") as f:
+            f.write(json.dumps({"schema": PROGRAM_CFG_SCHEMA, "version": self.version}))
+            f.write("\n")
+            f.flush(), os.fsync(f.fileno())
+
+    def apply(self, var: str, key: str, user: list) -> None:
+        # copy on write: sections that did not change are shared with the
+        # previous version, so readers holding it never see a partial edit
+        section = self.data[var][key]
+        i = self.index[(var, key)]
+        self.data = dict(self.data)
+        self.data[var] = dict(self.data[var])
+        self.data[var][key] = dict(section, user=list(user))
+        self.counts[var] += len(user) - len(section["user"])
+        self.configured = (
+            self.configured | (1 << i) if user else self.configured & ~(1 << i)
+        )
+        self.dirty |= 1 << i
+        self.version += 1
+
+    def set_user(self, var: str, key: str, user: list) -> bool:
+        if self.data[var][key]["user"] == list(user):
+            return False
+        self.apply(var, key, user)
+        with open(self.log_path, "a") as f:
+            f.write(json.dumps({"var": var, "key": key, "user": list(user)}) + "\n")
+            f.flush(), os.fsync(f.fileno())
+        self.deltas += 1
+        return True
+
+    def needs_compaction(self) -> bool:
+        return self.deltas >= self.compact_after
+
+    def compacted(self) -> None:
+        # call once self.data has been written out as the new base file
+        self.base, self.dirty, self.deltas = self.data, 0, 0
+        self.write_header()
+
+    def is_dirty(self, var: str, key: str) -> bool:
+        return bool(self.dirty >> self.index[(var, key)] & 1)
+
+    def fully_configured(self) -> bool:
+        return self.configured == self.all_bits
+
+    def unconfigured(self) -> list:
+        return [s for i, s in enumerate(self.sections) if not self.configured >> i & 1]
@@ -0,0 +1,46 @@
+import numpy as np
+
+# sign of each variable in the program equation: wp + nr - (o - pr)
+PROGRAM_WEIGHTS = {
+    "willpower": 1,
+    "negative reinforcement": 1,
+    "obsession": -1,
+    "positive reinforcement": 1,
+}
+
+
+def create_field_questions(prefix: str, entries: list, suffix: str) -> list:
+    if not suffix:
+        suffix = "?"
+    return list(map(lambda x: " ".join([prefix, x, suffix]), entries))
+
+
+def make_questions(var_cfg: dict, prompts_cfg: list) -> list:
+    q = []
+    for pre, field, suf in prompts_cfg:
+        q += create_field_questions(pre, var_cfg[field]["user"], suf)
+    return q
+
+
+class Questionnaire(object):
+    # every question of the program in measurement order, with the
+    # per-variable layout kept in flat arrays
+    def __init__(self, program_cfg: dict, program_prompts: list):
+        per_var = [
+            make_questions(program_cfg[var], prompts) for var, prompts in program_prompts
+        ]
+        self.var_names = [var for var, _ in program_prompts]
+        self.questions = tuple(q for qs in per_var for q in qs)
+        self.counts = np.array([len(qs) for qs in per_var], dtype=np.int32)
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts))).astype(np.int32)
+        self.var_of = np.repeat(np.arange(len(per_var), dtype=np.int32), self.counts)
+        self.weights = np.array(
+            [PROGRAM_WEIGHTS[var] for var in self.var_names], dtype=np.int8
+        )
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def var_questions(self, var: str) -> list:
+        i = self.var_names.index(var)
+        return list(self.questions[self.offsets[i] : self.offsets[i + 1]])
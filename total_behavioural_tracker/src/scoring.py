@@ -0,0 +1,57 @@
+import numpy as np
+from lazy import lazy_module
+from store import COLUMNS
+
+pd = lazy_module("pandas")
+
+# program = normalize_as_pct(wp + nr - (o - pr), -100, 400)
+PROGRAM_MIN, PROGRAM_RANGE = -100, 400
+
+
+def normalize_as_pct(val, min_val, val_range) -> np.ndarray:
+    # same float64 operations as util.normalize_as_pct; np.rint and round()
+    # both round half to even, so results are identical element for element
+    return np.rint(100 * ((np.asarray(val) - min_val) / val_range)).astype(np.int64)
+
+
+def var_onehot(var_of: np.ndarray, n_vars: int) -> np.ndarray:
+    onehot = np.zeros((len(var_of), n_vars), dtype=np.int64)
+    onehot[np.arange(len(var_of)), var_of] = 1
+    return onehot
+
+
+def score_counts(yes_counts, counts, weights) -> np.ndarray:
+    # (entries x vars) yes answers -> (entries x 5) store rows
+    yes_counts, counts = np.atleast_2d(yes_counts), np.asarray(counts)
+    if not counts.all():
+        raise ValueError("every variable needs at least one question to be scored")
+    return score_components(normalize_as_pct(yes_counts / counts, 0, 1), weights)
+
+
+def score_components(comps, weights) -> np.ndarray:
+    # (entries x vars) component percentages -> (entries x 5) store rows
+    comps = np.atleast_2d(np.asarray(comps, dtype=np.int64))
+    program = normalize_as_pct(
+        comps @ np.asarray(weights, dtype=np.int64), PROGRAM_MIN, PROGRAM_RANGE
+    )
+    return np.column_stack([comps, program])
+
+
+def score_answers(answers, questionnaire) -> np.ndarray:
+    # (entries x questions) yes/no matrix in questionnaire order
+    answers = np.atleast_2d(np.asarray(answers, dtype=bool))
+    if answers.shape[1] != len(questionnaire):
+        raise ValueError(
+            f"expected {len(questionnaire)} answers per entry, got {answers.shape[1]}"
+        )
+    onehot = var_onehot(questionnaire.var_of, len(questionnaire.var_names))
+    yes_counts = answers.astype(np.int64) @ onehot
+    return score_counts(yes_counts, questionnaire.counts, questionnaire.weights)
+
+
+def score_frame(answers, questionnaire, days=None):
+    scores = score_answers(answers, questionnaire)
+    index = (
+        None if days is None else pd.to_datetime(np.asarray(days, dtype="i8"), unit="D")
+    )
+    return pd.DataFrame(scores, columns=COLUMNS, index=index)
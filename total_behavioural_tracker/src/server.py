@@ -0,0 +1,372 @@
+import os
+import re
+import json
+import asyncio
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from kivy.logger import Logger
+from store import BinaryStore, COLUMNS, date_to_epoch_day, epoch_day_to_date
+from scoring import score_answers, score_components
+from util import get_app_cfg, get_date, get_program_cfg, PROGRAM_PROMPTS
+from questions import Questionnaire
+from lazy import timed_import
+from journal import JournaledStore
+from trends import TrendState
+
+USER_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+ROUTE = re.compile(r"^/users/([^/]+)/(measurements|history|trends|program|graph\.png)$")
+REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+MAX_BODY = 1 << 16
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super(HttpError, self).__init__(message)
+        self.status = status
+
+
+def is_int_list(values, n: int, allowed=None) -> bool:
+    # json true/false arrive as bools, which are ints; strings never count
+    return (
+        isinstance(values, list)
+        and len(values) == n
+        and all(isinstance(i, int) for i in values)
+        and (allowed is None or all(i in allowed for i in values))
+    )
+
+
+class UserState(object):
+    # one client's store plus everything derived from it
+    def __init__(self, user_dir: str, journal: bool = False):
+        os.makedirs(user_dir, exist_ok=True)
+        self.dir = user_dir
+        data_file = os.path.join(user_dir, "program_data.bin")
+        self.store = BinaryStore(data_file)
+        if journal:
+            self.store = JournaledStore(self.store, f"{data_file}.wal")
+        self.img_file = os.path.join(user_dir, "program_graph.png")
+        self.program_file = os.path.join(user_dir, "program_cfg.json")
+        self.history = self.renderer = self.trends = self.questionnaire = None
+        self.lock, self.pending = asyncio.Lock(), 0
+
+    def get_history(self) -> tuple:
+        if self.history is None:
+            days, scores = self.store.columns()
+            self.history = days.copy(), scores.copy()
+        return self.history
+
+    def get_trends(self) -> TrendState:
+        if self.trends is None:
+            days, scores = self.store.columns()
+            self.trends = TrendState.from_columns(
+                days, scores, get_app_cfg("util")["trends"]
+            )
+        return self.trends
+
+    def get_program_cfg(self) -> dict:
+        # every client scores against its own program; a new client starts
+        # from a copy of this install's
+        if not os.path.exists(self.program_file):
+            self.set_program_cfg(get_program_cfg())
+        with open(self.program_file) as f:
+            return json.load(f)
+
+    def set_program_cfg(self, cfg: dict) -> None:
+        try:
+            questionnaire = Questionnaire(cfg, PROGRAM_PROMPTS)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise HttpError(400, f"invalid program config: {e!r}")
+        tmp = f"{self.program_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(cfg, f)
+            f.flush(), os.fsync(f.fileno())
+        os.replace(tmp, self.program_file)
+        self.questionnaire = questionnaire
+
+    def get_questionnaire(self) -> Questionnaire:
+        if self.questionnaire is None:
+            self.questionnaire = Questionnaire(self.get_program_cfg(), PROGRAM_PROMPTS)
+        return self.questionnaire
+
+    def add(self, date: str, scores: list) -> None:
+        # the store, the trends and the graph all assume days only go forward
+        last, day = self.store.last(), date_to_epoch_day(date)
+        if last and day < last[0]:
+            raise HttpError(
+                400, f"{date} is before the last entry {epoch_day_to_date(last[0])}"
+            )
+        if last and last[0] == day:
+            self.store.replace_last(date, scores)  # re-measured the same day
+            if self.trends is not None and not self.trends.remove_last():
+                self.trends = None
+        else:
+            self.store.append(date, scores)
+        if self.trends is not None:
+            self.trends.add(day, scores)
+        self.history = None
+
+    def render(self) -> bytes:
+        if self.renderer is None:
+            plot = timed_import("plot")
+            self.renderer = plot.GraphRenderer(get_app_cfg("util")["plot"])
+        self.renderer.render(self.store.frame(), self.img_file)
+        with open(self.img_file, "rb") as f:
+            return f.read()
+
+    def close(self) -> None:
+        if self.renderer is not None:
+            self.renderer.close()
+        if isinstance(self.store, JournaledStore):
+            self.store.close()
+        self.history = self.renderer = self.trends = self.questionnaire = None
+
+
+class UserCache(object):
+    def __init__(self, data_dir: str, max_users: int, journal: bool = False):
+        self.data_dir, self.max_users, self.journal = data_dir, max_users, journal
+        self.users = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, user_id: str) -> UserState:
+        if not USER_ID.match(user_id):
+            raise HttpError(400, f"invalid user id: {user_id}")
+        state = self.users.get(user_id)
+        if state is not None:
+            self.hits += 1
+            self.users.move_to_end(user_id)
+            return state
+        self.misses += 1
+        state = self.users[user_id] = UserState(
+            os.path.join(self.data_dir, user_id), self.journal
+        )
+        while len(self.users) > self.max_users:
+            evicted = next(iter(self.users.values()))
+            if evicted.pending:
+                break  # never evict a user with a request in flight
+            self.users.popitem(last=False)[1].close()
+            self.evictions += 1
+        return state
+
+
+class TrackerServer(object):
+    def __init__(
+        self,
+        data_dir: str,
+        max_users=128,
+        max_connections=256,
+        workers=4,
+        journal=False,
+    ):
+        self.users = UserCache(data_dir, max_users, journal)
+        self.io_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="io")
+        # matplotlib is not thread safe, so every render shares one thread
+        self.render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plot")
+        self.slots = asyncio.Semaphore(max_connections)
+        self.requests = 0
+
+    async def run_io(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.io_pool, func, *args
+        )
+
+    async def submit(self, state: UserState, body: dict) -> dict:
+        questionnaire = await self.run_io(state.get_questionnaire)
+        if "answers" in body:
+            answers = body["answers"]
+            if not is_int_list(answers, len(questionnaire), (0, 1)):
+                raise HttpError(
+                    400, f"expected a list of {len(questionnaire)} yes/no answers"
+                )
+            scores = score_answers([answers], questionnaire)[0]
+        elif "scores" in body:
+            if not is_int_list(body["scores"], len(COLUMNS) - 1):
+                raise HttpError(400, "expected a list of four integer 'scores'")
+            scores = score_components([body["scores"]], questionnaire.weights)[0]
+        else:
+            raise HttpError(400, "expected 'answers' or four component 'scores'")
+        scores = [int(i) for i in scores]
+        if not all(0 <= i <= 100 for i in scores):
+            raise HttpError(400, "scores must be between 0 and 100")
+        date = body.get("date") or get_date()
+        try:
+            day = date_to_epoch_day(str(date))
+        except ValueError:
+            raise HttpError(400, f"invalid date: {date}")
+        if day > date_to_epoch_day(get_date()):
+            raise HttpError(400, f"{date} is in the future")
+        await self.run_io(state.add, date, scores)
+        return {"date": date, **dict(zip(COLUMNS, scores))}
+
+    async def history(self, state: UserState) -> dict:
+        days, scores = await self.run_io(state.get_history)
+        return {
+            "columns": COLUMNS,
+            "dates": [epoch_day_to_date(d) for d in days],
+            "rows": scores.tolist(),
+        }
+
+    async def trends(self, state: UserState) -> dict:
+        trends = await self.run_io(state.get_trends)
+        days, values = trends.overlay(get_app_cfg("util")["plot"]["lod"]["max_points"])
+        return {
+            "latest": trends.latest(),
+            "program_trend": {
+                "dates": [epoch_day_to_date(d) for d in days],
+                "values": [round(float(v), 2) for v in values],
+            },
+        }
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> tuple:
+        match = ROUTE.match(path.split("?")[0])
+        if not match:
+            raise HttpError(404, f"no route for {path}")
+        user_id, resource = match.groups()
+        state = self.users.get(user_id)
+        state.pending += 1
+        try:
+            async with state.lock:
+                return await self.route(state, method, resource, body)
+        finally:
+            state.pending -= 1
+
+    async def route(self, state: UserState, method: str, resource: str, body: bytes):
+        if resource == "measurements" and method == "POST":
+            result = await self.submit(state, parse_json(body))
+            return 201, "application/json", json.dumps(result).encode()
+        if resource == "history" and method == "GET":
+            result = await self.history(state)
+            return 200, "application/json", json.dumps(result).encode()
+        if resource == "trends" and method == "GET":
+            result = await self.trends(state)
+            return 200, "application/json", json.dumps(result).encode()
+        if resource == "program" and method == "GET":
+            result = await self.run_io(state.get_program_cfg)
+            return 200, "application/json", json.dumps(result).encode()
+        if resource == "program" and method == "PUT":
+            await self.run_io(state.set_program_cfg, parse_json(body))
+            result = {"questions": len(state.questionnaire)}
+            return 200, "application/json", json.dumps(result).encode()
+        if resource == "graph.png" and method == "GET":
+            loop = asyncio.get_running_loop()
+            png = await loop.run_in_executor(self.render_pool, state.render)
+            return 200, "image/png", png
+        raise HttpError(405, f"{method} not allowed on {resource}")
+
+    async def handle(self, reader, writer) -> None:
+        async with self.slots:
+            try:
+                while await self.handle_request(reader, writer):
+                    pass
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+    async def handle_request(self, reader, writer) -> bool:
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return False
+        headers = await read_headers(reader)
+        keep_alive = headers.get("connection", "").lower() != "close"
+        try:
+            method, path, _ = request_line.decode("latin-1").split()
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY:
+                raise HttpError(413, "request body too large")
+            body = await reader.readexactly(length) if length else b""
+            status, ctype, payload = await self.dispatch(method, path, body)
+        except HttpError as e:
+            keep_alive = keep_alive and e.status != 413  # body left unread
+            status, ctype = e.status, "application/json"
+            payload = json.dumps({"error": str(e)}).encode()
+        except ValueError as e:
+            status, ctype = 400, "application/json"
+            payload = json.dumps({"error": str(e)}).encode()
+        except Exception as e:
+            Logger.exception(f"Server: {e}")
+            status, ctype = 500, "application/json"
+            payload = json.dumps({"error": "internal error"}).encode()
+        self.requests += 1
+        writer.write(response_bytes(status, ctype, payload, keep_alive))
+        await writer.drain()
+        return keep_alive
+
+    def stats(self) -> dict:
+        cache = self.users
+        return {
+            "requests": self.requests,
+            "cached_users": len(cache.users),
+            "cache_hits": cache.hits,
+            "cache_misses": cache.misses,
+            "evictions": cache.evictions,
+        }
+
+    async def serve(self, host: str, port: int):
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def read_headers(reader) -> dict:
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if not line or line in (b"\r\n", b"\n"):
+            return headers
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+
+
+def parse_json(body: bytes) -> dict:
+    try:
+        data = json.loads(body or b"{}")
+    except json.JSONDecodeError as e:
+        raise HttpError(400, f"invalid json: {e}")
+    if not isinstance(data, dict):
+        raise HttpError(400, "expected a json object")
+    return data
+
+
+def response_bytes(status: int, ctype: str, payload: bytes, keep_alive: bool) -> bytes:
+    head = (
+        f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+        f"Content-Type: {ctype}\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + payload
+
+
+async def main(args) -> None:
+    server = TrackerServer(
+        args.data_dir, args.max_users, args.max_connections, args.workers, args.journal
+    )
+    tcp = await server.serve(args.host, args.port)
+    Logger.info(f"Server: serving {args.data_dir} on {args.host}:{args.port}")
+    async with tcp:
+        await tcp.serve_forever()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-user tracker data service")
+    parser.add_argument("--data-dir", default="server_data")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-users", type=int, default=128)
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--journal", action="store_true", help="journal writes with group commit"
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,278 @@
+from __future__ import annotations
+import os
+import csv
+import struct
+import hashlib
+import datetime
+import numpy as np
+from lazy import lazy_module
+
+pd = lazy_module("pandas")
+
+COLUMNS = [
+    "willpower",
+    "negative_reinforcement",
+    "obsession",
+    "positive_reinforcement",
+    "program",
+]
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# binary layout: header | fixed-width records | index footer
+BIN_MAGIC, BIN_FOOTER_MAGIC, BIN_VERSION = b"TBTS", b"TBTI", 1
+BIN_HEADER = struct.Struct("<4sHHH")  # magic, version, ncols, record size
+# the footer is smaller than a record so a torn append can never be
+# mistaken for a complete record
+BIN_FOOTER = struct.Struct("<4sQ")  # magic, nrows
+TAIL_BLOCK = 4096
+RECORD = np.dtype([("date", "<i4"), ("scores", "<i2", (len(COLUMNS),))])
+
+
+def date_to_epoch_day(date: str) -> int:
+    y, m, d = (int(i) for i in date.split()[0].split("-"))
+    return datetime.date(y, m, d).toordinal() - EPOCH_ORDINAL
+
+
+def epoch_day_to_date(day: int) -> str:
+    d = datetime.date.fromordinal(int(day) + EPOCH_ORDINAL)
+    return f"{d.year}-{d.month}-{d.day}"
+
+
+def columns_hash(days, scores, names=COLUMNS) -> str:
+    # identifies a history from its columns alone, so a cached graph can be
+    # checked against the store before pandas or matplotlib are loaded
+    h = hashlib.sha1(",".join(names).encode())
+    h.update(np.asarray(days, dtype="<i8").tobytes())
+    h.update(np.ascontiguousarray(scores, dtype="<i8").tobytes())
+    return h.hexdigest()
+
+
+def read_hash(hash_file) -> str:
+    try:
+        with open(hash_file, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def empty_frame() -> pd.DataFrame:
+    df = pd.DataFrame(columns=COLUMNS)
+    df.index = pd.to_datetime([])
+    df.index.name = "date"
+    return df
+
+
+def columns_frame(days, scores) -> pd.DataFrame:
+    if not len(days):
+        return empty_frame()
+    index = pd.to_datetime(np.asarray(days, dtype="i8"), unit="D")
+    index.name = "date"
+    # copied, so a frame never outlives the file pages it was built from
+    return pd.DataFrame(scores, columns=COLUMNS, index=index, copy=True)
+
+
+def parse_row(row: list):
+    # legacy rows can carry a stray '""' from the old blank-row writer
+    row = [i.strip('"') for i in row if i.strip('"')]
+    if len(row) == len(COLUMNS) + 1 and row[0] != "date":
+        return date_to_epoch_day(row[0]), [int(i) for i in row[1:]]
+    return None
+
+
+class CsvStore(object):
+    name = "csv"
+
+    def __init__(self, path):
+        self.path = str(path)
+
+    def append(self, date: str, scores: list) -> None:
+        line = ",".join([date] + [str(i) for i in scores]) + "\n"
+        with open(self.path, "a+b") as f:
+            self.write_line(f, line.encode())
+
+    def write_line(self, f, line: bytes) -> None:
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                line = b"\n" + line
+        f.seek(end)
+        f.write(line)
+        f.flush(), os.fsync(f.fileno())
+
+    def tail_record(self, f) -> tuple:
+        # (offset, row) of the last data row, read backwards from the end
+        pos = f.seek(0, os.SEEK_END)
+        buf = b""
+        while pos > 0:
+            step = min(TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+            lines, off = buf.split(b"\n"), pos + len(buf)
+            for i in range(len(lines) - 1, -1 if not pos else 0, -1):
+                off -= len(lines[i])
+                row = parse_row(next(csv.reader([lines[i].decode()]), []))
+                if row:
+                    return off, row
+                if i == 0:
+                    return None, None  # reached the header
+                off -= 1
+            buf = lines[0]
+            pos = off - len(buf)
+        return None, None
+
+    def last(self):
+        with open(self.path, "rb") as f:
+            return self.tail_record(f)[1]
+
+    def drop_last(self) -> None:
+        with open(self.path, "r+b") as f:
+            off, _ = self.tail_record(f)
+            if off is not None:
+                f.truncate(off)
+                f.flush(), os.fsync(f.fileno())
+
+    def replace_last(self, date: str, scores: list) -> None:
+        # a single ftruncate followed by a single append, so a crash leaves
+        # either the old row, no row, or the new row - never a torn file
+        line = ",".join([date] + [str(i) for i in scores]) + "\n"
+        with open(self.path, "r+b") as f:
+            off, _ = self.tail_record(f)
+            if off is not None:
+                f.truncate(off)
+            self.write_line(f, line.encode())
+
+    def frame(self) -> pd.DataFrame:
+        # parsed by hand: pandas date inference is slow on unpadded dates
+        return columns_frame(*self.columns())
+
+    def columns(self) -> tuple:
+        rows = list(self.rows())
+        days = np.array([i[0] for i in rows], dtype="<i4")
+        scores = np.array([i[1] for i in rows], dtype="<i2").reshape(-1, len(COLUMNS))
+        return days, scores
+
+    def rows(self):
+        with open(self.path, "r", newline="") as f:
+            yield from filter(None, map(parse_row, csv.reader(f)))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.rows())
+
+
+class BinaryStore(object):
+    name = "binary"
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.data_start = BIN_HEADER.size
+        if not os.path.exists(self.path):
+            self.create()
+        self.check_header()
+
+    def create(self) -> None:
+        with open(self.path, "wb") as f:
+            f.write(BIN_HEADER.pack(BIN_MAGIC, BIN_VERSION, len(COLUMNS), RECORD.itemsize))
+            f.write(BIN_FOOTER.pack(BIN_FOOTER_MAGIC, 0))
+
+    def check_header(self) -> None:
+        with open(self.path, "rb") as f:
+            magic, version, ncols, rsize = BIN_HEADER.unpack(f.read(BIN_HEADER.size))
+        if (magic, version, ncols, rsize) != (
+            BIN_MAGIC,
+            BIN_VERSION,
+            len(COLUMNS),
+            RECORD.itemsize,
+        ):
+            raise ValueError(f"unsupported data store: {self.path}")
+
+    def read_footer(self, f) -> int:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(size - BIN_FOOTER.size)
+        magic, n = BIN_FOOTER.unpack(f.read(BIN_FOOTER.size))
+        if magic == BIN_FOOTER_MAGIC and (
+            self.data_start + n * RECORD.itemsize + BIN_FOOTER.size == size
+        ):
+            return n
+        return self.recover(f, size)
+
+    def recover(self, f, size: int) -> int:
+        # interrupted append: keep every complete record and rebuild the footer
+        n = max(size - self.data_start, 0) // RECORD.itemsize
+        if f.writable():
+            self.write_footer(f, n)
+            f.truncate()
+        return n
+
+    def read_record(self, f, i: int) -> tuple:
+        f.seek(self.data_start + i * RECORD.itemsize)
+        rec = np.frombuffer(f.read(RECORD.itemsize), dtype=RECORD)[0]
+        return int(rec["date"]), [int(i) for i in rec["scores"]]
+
+    def write_footer(self, f, n: int) -> None:
+        f.seek(self.data_start + n * RECORD.itemsize)
+        f.write(BIN_FOOTER.pack(BIN_FOOTER_MAGIC, n))
+
+    def append_days(self, days, scores) -> None:
+        recs = np.empty(len(days), dtype=RECORD)
+        recs["date"], recs["scores"] = days, scores
+        if not len(recs):
+            return
+        with open(self.path, "r+b") as f:
+            n = self.read_footer(f)
+            f.seek(self.data_start + n * RECORD.itemsize)
+            f.write(recs.tobytes() + BIN_FOOTER.pack(BIN_FOOTER_MAGIC, n + len(recs)))
+            f.flush(), os.fsync(f.fileno())
+
+    def append(self, date: str, scores: list) -> None:
+        self.append_days([date_to_epoch_day(date)], [scores])
+
+    def __len__(self) -> int:
+        with open(self.path, "rb") as f:
+            return self.read_footer(f)
+
+    def last(self):
+        with open(self.path, "rb") as f:
+            n = self.read_footer(f)
+            return self.read_record(f, n - 1) if n else None
+
+    def replace_last(self, date: str, scores: list) -> None:
+        rec = np.empty(1, dtype=RECORD)
+        rec["date"], rec["scores"] = date_to_epoch_day(date), [scores]
+        with open(self.path, "r+b") as f:
+            n = self.read_footer(f)
+            if n:
+                # fixed-width record: one in-place write of RECORD.itemsize bytes
+                f.seek(self.data_start + (n - 1) * RECORD.itemsize)
+                f.write(rec.tobytes())
+                f.flush(), os.fsync(f.fileno())
+                return
+        self.append(date, scores)
+
+    def drop_last(self) -> None:
+        with open(self.path, "r+b") as f:
+            n = self.read_footer(f)
+            if n:
+                f.truncate(self.data_start + (n - 1) * RECORD.itemsize)
+                self.write_footer(f, n - 1)
+                f.flush(), os.fsync(f.fileno())
+
+    def columns(self) -> tuple:
+        # views of the mapped file, only valid until the next drop_last
+        n = len(self)
+        if not n:
+            return np.empty(0, "<i4"), np.empty((0, len(COLUMNS)), "<i2")
+        recs = np.memmap(self.path, dtype=RECORD, mode="r", offset=self.data_start, shape=(n,))
+        return recs["date"], recs["scores"]
+
+    def frame(self) -> pd.DataFrame:
+        return columns_frame(*self.columns())
+
+    def rows(self):
+        days, scores = self.columns()
+        for day, row in zip(days, scores):
+            yield int(day), [int(i) for i in row]
+
+
+STORES = {CsvStore.name: CsvStore, BinaryStore.name: BinaryStore}
@@ -0,0 +1,356 @@
+import os
+import json
+import argparse
+import numpy as np
+from lazy import lazy_module
+from store import BinaryStore, CsvStore, COLUMNS
+
+pa = lazy_module("pyarrow")
+pq = lazy_module("pyarrow.parquet")
+
+CHUNK_ROWS = 1 << 16
+MAX_SCORE = 100
+# date, then the five scores; the date splits into three values
+N_FIELDS = 1 + len(COLUMNS)
+ROW_VALUES = N_FIELDS + 2
+ROW_BYTES = 32
+HEADER = ",".join(["date"] + COLUMNS) + "\n"
+ROW_FORMAT = "%d-%d-%d," + ",".join(["%d"] * len(COLUMNS)) + "\n"
+DAYS_IN_MONTH = np.array([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+class TransferStats(object):
+    def __init__(self):
+        self.rows = self.blank = self.invalid = self.existing = 0
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+# proleptic gregorian <-> days since 1970-01-01 without building dates,
+# vectorised over whole chunks (H. Hinnant's civil calendar algorithms)
+def days_from_civil(y, m, d) -> np.ndarray:
+    y = y - (m <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * ((m + 9) % 12) + 2) // 5 + d - 1
+    return (era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468).astype(
+        "<i4"
+    )
+
+
+def civil_from_days(days) -> tuple:
+    z = np.asarray(days, dtype=np.int64) + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    d = doy - (153 * mp + 2) // 5 + 1
+    m = np.where(mp < 10, mp + 3, mp - 9)
+    return yoe + era * 400 + (m <= 2), m, d
+
+
+def is_leap(y) -> np.ndarray:
+    return (y % 4 == 0) & ((y % 100 != 0) | (y % 400 == 0))
+
+
+def invalid_rows(ymd: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    y, m, d = ymd.T
+    month_ok = (m >= 1) & (m <= 12)
+    month_len = DAYS_IN_MONTH[np.where(month_ok, m, 0)] - ((m == 2) & ~is_leap(y))
+    bad = ~month_ok | (d < 1) | (d > month_len)
+    return bad | ((scores < 0) | (scores > MAX_SCORE)).any(axis=1)
+
+
+def split_line(line: bytes):
+    # 2024-1-15,75,50,25,100,75 -> [b'2024', b'1', b'15', b'75', ...]
+    if b'"' in line:
+        line = line.replace(b'"', b"")  # legacy blank-row writer
+    fields = line.split(b",")
+    if len(fields) != N_FIELDS:
+        return None
+    date = fields[0].split()[0] if b" " in fields[0] else fields[0]
+    ymd = date.split(b"-")
+    if len(ymd) != 3:
+        return None
+    return ymd + fields[1:]
+
+
+def read_csv(path, stats: TransferStats, chunk_rows=CHUNK_ROWS, strict=True):
+    # yields (days, scores) per block of whole lines, so memory is bounded
+    # by the block size however long the history is
+    block_bytes = chunk_rows * ROW_BYTES
+    with open(path, "rb") as f:
+        lineno, tail = 1, b""
+        while True:
+            data = f.read(block_bytes)
+            block, tail = cut_block(tail + data, data)
+            if block:
+                chunk = parse_block(path, block, lineno, stats, strict)
+                lineno += block.count(b"\n")
+                if len(chunk[0]):
+                    yield chunk
+            if not data:
+                return
+
+
+def cut_block(buf: bytes, data: bytes) -> tuple:
+    if not data:
+        return buf, b""
+    cut = buf.rfind(b"\n") + 1
+    return buf[:cut], buf[cut:]
+
+
+def parse_block(path, block: bytes, lineno: int, stats, strict: bool) -> tuple:
+    # fast path: every non-blank line is 'y-m-d,s,s,s,s,s', so the whole
+    # block parses as one flat run of integers
+    lines = block.replace(b'"', b"").split()
+    n_lines = block.count(b"\n") + (not block.endswith(b"\n"))
+    if lines and lines[0].startswith(b"date,"):
+        lines, n_lines = lines[1:], n_lines - 1
+    values = np.array(b",".join(lines).replace(b"-", b",").split(b","))
+    if values.size == len(lines) * ROW_VALUES:
+        try:
+            table = values.astype(np.int64).reshape(-1, ROW_VALUES)
+        except ValueError:
+            table = None
+        if table is not None and not invalid_rows(table[:, :3], table[:, 3:]).any():
+            stats.rows += len(table)
+            stats.blank += n_lines - len(table)
+            return days_from_civil(*table[:, :3].T), table[:, 3:].astype("<i2")
+    return parse_lines(path, block, lineno, stats, strict)
+
+
+def parse_lines(path, block: bytes, lineno: int, stats, strict: bool) -> tuple:
+    # slow path for blocks with bad rows: line by line, to report or drop them
+    fields, linenos, malformed = [], [], []
+    for lineno, line in enumerate(block.splitlines(), lineno):
+        line = line.strip()
+        if not line or line == b'""':
+            stats.blank += 1
+            continue
+        if line.startswith(b"date,"):
+            continue
+        row = split_line(line)
+        if row is None:
+            malformed.append((lineno, f"malformed row {line!r}"))
+            continue
+        fields += row
+        linenos.append(lineno)
+    return parse_chunk(path, fields, linenos, stats, strict, malformed)
+
+
+def parse_chunk(
+    path, fields: list, linenos: list, stats, strict: bool, malformed=()
+) -> tuple:
+    # malformed: (lineno, reason) of the lines that did not split into a row
+    non_integer = set()
+    try:
+        table = np.array(fields).astype(np.int64).reshape(len(linenos), -1)
+    except ValueError:
+        # find the offending rows, then parse the rest one by one
+        table = []
+        for i, lineno in enumerate(linenos):
+            row = fields[i * ROW_VALUES : (i + 1) * ROW_VALUES]
+            try:
+                table.append([int(j) for j in row])
+            except ValueError:
+                non_integer.add(i)
+                table.append([0, 0, 0] + [-1] * len(COLUMNS))  # dropped below
+        table = np.array(table, dtype=np.int64).reshape(-1, ROW_VALUES)
+    ymd, scores = table[:, :3], table[:, 3:]
+    bad = invalid_rows(ymd, scores)
+    if strict and (malformed or bad.any()):
+        # whatever is wrong with it, the first bad line of the file is named
+        errors = list(malformed)
+        if bad.any():
+            i = int(np.argmax(bad))
+            reason = (
+                "non-integer field"
+                if i in non_integer
+                else "invalid date or score out of range"
+            )
+            errors.append((linenos[i], reason))
+        lineno, reason = min(errors)
+        raise ValueError(f"{path}:{lineno}: {reason}")
+    stats.invalid += len(malformed) + int(bad.sum())
+    if bad.any():
+        ymd, scores = ymd[~bad], scores[~bad]
+    stats.rows += len(ymd)
+    return days_from_civil(*ymd.T), scores.astype("<i2")
+
+
+def read_binary(path, stats: TransferStats, chunk_rows=CHUNK_ROWS, strict=True):
+    days, scores = BinaryStore(path).columns()  # memory mapped
+    for i in range(0, len(days), chunk_rows):
+        chunk = np.array(days[i : i + chunk_rows]), np.array(scores[i : i + chunk_rows])
+        stats.rows += len(chunk[0])
+        yield chunk
+
+
+def arrow_chunk(batch) -> tuple:
+    days = batch.column(0).cast(pa.int32()).to_numpy().astype("<i4")
+    scores = np.column_stack([batch.column(c).to_numpy() for c in COLUMNS])
+    return days, scores.astype("<i2")
+
+
+def read_parquet(path, stats: TransferStats, chunk_rows=CHUNK_ROWS, strict=True):
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+        chunk = arrow_chunk(batch)
+        stats.rows += len(chunk[0])
+        yield chunk
+
+
+def read_arrow(path, stats: TransferStats, chunk_rows=CHUNK_ROWS, strict=True):
+    with pa.memory_map(str(path), "r") as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            chunk = arrow_chunk(reader.get_batch(i))
+            stats.rows += len(chunk[0])
+            yield chunk
+
+
+def arrow_schema():
+    return pa.schema([("date", pa.date32())] + [(c, pa.int16()) for c in COLUMNS])
+
+
+def arrow_batch(days, scores):
+    arrays = [pa.array(days.astype("<i4"), type=pa.int32()).cast(pa.date32())]
+    arrays += [pa.array(scores[:, i].astype("<i2")) for i in range(len(COLUMNS))]
+    return pa.record_batch(arrays, schema=arrow_schema())
+
+
+def ends_with_newline(path) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class CsvWriter(object):
+    def __init__(self, path):
+        fresh = not os.path.exists(path) or not os.path.getsize(path)
+        unterminated = not fresh and not ends_with_newline(path)
+        self.file = open(path, "a")
+        if fresh:
+            self.file.write(HEADER)
+        elif unterminated:
+            self.file.write("\n")  # as CsvStore.write_line, or the rows join up
+
+    def write(self, days, scores) -> None:
+        table = np.column_stack([*civil_from_days(days), scores]).tolist()
+        self.file.write("".join(ROW_FORMAT % tuple(row) for row in table))
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class BinaryWriter(object):
+    def __init__(self, path):
+        self.store = BinaryStore(path)
+
+    def write(self, days, scores) -> None:
+        self.store.append_days(days, scores)
+
+    def close(self) -> None:
+        pass
+
+
+class ParquetWriter(object):
+    def __init__(self, path):
+        self.writer = pq.ParquetWriter(str(path), arrow_schema())
+
+    def write(self, days, scores) -> None:
+        self.writer.write_batch(arrow_batch(days, scores))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class ArrowWriter(object):
+    def __init__(self, path):
+        self.sink = pa.OSFile(str(path), "wb")
+        self.writer = pa.ipc.new_file(self.sink, arrow_schema())
+
+    def write(self, days, scores) -> None:
+        self.writer.write_batch(arrow_batch(days, scores))
+
+    def close(self) -> None:
+        self.writer.close()
+        self.sink.close()
+
+
+READERS = {
+    ".csv": read_csv,
+    ".bin": read_binary,
+    ".parquet": read_parquet,
+    ".arrow": read_arrow,
+}
+STORE_FORMATS = {".csv": CsvStore, ".bin": BinaryStore}
+WRITERS = {
+    ".csv": CsvWriter,
+    ".bin": BinaryWriter,
+    ".parquet": ParquetWriter,
+    ".arrow": ArrowWriter,
+}
+
+
+def file_format(path, table: dict) -> str:
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext not in table:
+        raise ValueError(f"unsupported history format '{ext}' ({', '.join(table)})")
+    return ext
+
+
+def last_day(path, ext: str):
+    # appending to existing history only takes what is newer than its end
+    if ext not in STORE_FORMATS or not os.path.exists(path):
+        return None
+    last = STORE_FORMATS[ext](path).last()
+    return last[0] if last else None
+
+
+def transfer(src, dst, chunk_rows=CHUNK_ROWS, strict=True) -> TransferStats:
+    reader = READERS[file_format(src, READERS)]
+    dst_ext = file_format(dst, WRITERS)
+    since, stats = last_day(dst, dst_ext), TransferStats()
+    if dst_ext in (".parquet", ".arrow") and os.path.exists(dst):
+        os.remove(dst)  # columnar files are rewritten, never appended to
+    writer = WRITERS[dst_ext](dst)
+    try:
+        for days, scores in reader(src, stats, chunk_rows, strict):
+            if since is not None:
+                newer = days > since
+                stats.existing += int(len(days) - newer.sum())
+                days, scores = days[newer], scores[newer]
+            if len(days):
+                writer.write(days, scores)
+    finally:
+        writer.close()
+    return stats
+
+
+def import_csv(src, dst: BinaryStore) -> int:
+    writer, stats = BinaryWriter(dst.path), TransferStats()
+    for days, scores in read_csv(src, stats, strict=False):
+        writer.write(days, scores)
+    return stats.rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Stream tracker history between csv, binary, parquet and arrow"
+    )
+    parser.add_argument("src")
+    parser.add_argument("dst")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument(
+        "--skip-invalid", action="store_true", help="drop bad rows instead of failing"
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    stats = transfer(args.src, args.dst, args.chunk_rows, not args.skip_invalid)
+    print(json.dumps(stats.as_dict()))
@@ -0,0 +1,185 @@
+import os
+import json
+import argparse
+from collections import deque
+import numpy as np
+from lazy import lazy_module
+from store import COLUMNS, epoch_day_to_date
+from transfer import STORE_FORMATS, file_format
+
+pd = lazy_module("pandas")
+
+MEAN_COLUMNS = [f"{c}_mean" for c in COLUMNS]
+EWM_COLUMNS = [f"{c}_ewm" for c in COLUMNS]
+PROGRAM = COLUMNS.index("program")
+
+
+# all windows count entries, not calendar days: a skipped day does not
+# dilute the mean, it just is not there
+def rolling_mean(scores: np.ndarray, window: int) -> np.ndarray:
+    sums = np.cumsum(scores, axis=0, dtype=np.int64)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(scores) + 1), window)
+    return sums / counts[:, None]
+
+
+def ewma(scores: np.ndarray, span: float) -> np.ndarray:
+    # y[0] = x[0], y[t] = y[t-1] + a * (x[t] - y[t-1]), the same recurrence
+    # TrendState.add applies one row at a time
+    if not len(scores):
+        return np.empty((0, scores.shape[1]))
+    frame = pd.DataFrame(np.asarray(scores, dtype=np.float64))
+    return frame.ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def danger_streaks(program: np.ndarray, danger: int) -> np.ndarray:
+    # consecutive entries below the danger line, ending at each entry
+    below = np.asarray(program) < danger
+    idx = np.arange(len(below))
+    last_safe = np.maximum.accumulate(np.where(below, -1, idx))
+    return np.where(below, idx - last_safe, 0)
+
+
+def trend_change(ewm: np.ndarray, lookback: int) -> np.ndarray:
+    change = np.zeros_like(ewm)
+    change[lookback:] = ewm[lookback:] - ewm[:-lookback]
+    return change
+
+
+def warning_flags(ewm: np.ndarray, cfg: dict) -> dict:
+    change = trend_change(ewm, cfg["lookback"])
+    return {
+        name: sign * change[:, COLUMNS.index(col)] >= cfg["min_change"]
+        for name, (col, sign) in cfg["warnings"].items()
+    }
+
+
+def trend_columns(scores, cfg: dict) -> dict:
+    scores = np.asarray(scores).reshape(-1, len(COLUMNS))
+    means, ewm = rolling_mean(scores, cfg["window"]), ewma(scores, cfg["ewm_span"])
+    columns = dict(zip(MEAN_COLUMNS, means.T))
+    columns.update(zip(EWM_COLUMNS, ewm.T))
+    columns["danger_streak"] = danger_streaks(scores[:, PROGRAM], cfg["danger"])
+    columns.update(warning_flags(ewm, cfg))
+    return columns
+
+
+def trend_frame(df, cfg: dict):
+    # the whole history at once, over get_formatted_df()'s columns
+    return pd.DataFrame(trend_columns(df[COLUMNS].to_numpy(), cfg), index=df.index)
+
+
+class TrendState(object):
+    # the tail of every trend, advanced one entry at a time; the full
+    # history is only walked once, when the state is first built
+    def __init__(self, cfg: dict):
+        self.cfg = cfg
+        self.alpha = 2 / (cfg["ewm_span"] + 1)
+        self.recent = deque(maxlen=cfg["window"])
+        self.sums = np.zeros(len(COLUMNS), dtype=np.int64)
+        self.ewm = None
+        self.ewm_recent = deque(maxlen=cfg["lookback"] + 1)
+        self.streak = self.n = 0
+        self.day = None
+        self.days, self.program_ewm = [], []
+        self.undo = None
+
+    @classmethod
+    def from_columns(cls, days, scores, cfg: dict):
+        state = cls(cfg)
+        scores = np.asarray(scores, dtype=np.int64).reshape(-1, len(COLUMNS))
+        if not len(scores):
+            return state
+        ewm = ewma(scores, cfg["ewm_span"])
+        state.recent.extend(scores[-cfg["window"] :])
+        state.sums = np.sum(state.recent, axis=0, dtype=np.int64)
+        state.ewm = ewm[-1]
+        state.ewm_recent.extend(ewm[-(cfg["lookback"] + 1) :])
+        state.streak = int(danger_streaks(scores[:, PROGRAM], cfg["danger"])[-1])
+        state.n, state.day = len(scores), int(days[-1])
+        state.days, state.program_ewm = list(days), list(ewm[:, PROGRAM])
+        return state
+
+    def add(self, day: int, scores) -> dict:
+        row = np.asarray(scores, dtype=np.int64)
+        self.undo = (
+            list(self.recent),
+            self.sums.copy(),
+            self.ewm,
+            list(self.ewm_recent),
+            self.streak,
+            self.day,
+        )
+        if len(self.recent) == self.recent.maxlen:
+            self.sums -= self.recent[0]
+        self.recent.append(row)
+        self.sums += row
+        self.ewm = (
+            row.astype(np.float64)
+            if self.ewm is None
+            else self.ewm + (self.alpha * (row - self.ewm))
+        )
+        self.ewm_recent.append(self.ewm)
+        self.streak = self.streak + 1 if row[PROGRAM] < self.cfg["danger"] else 0
+        self.n, self.day = self.n + 1, int(day)
+        self.days.append(self.day), self.program_ewm.append(self.ewm[PROGRAM])
+        return self.latest()
+
+    def remove_last(self) -> bool:
+        # one step back (a re-measured day); False when the state must be rebuilt
+        if self.undo is None:
+            return False
+        recent, self.sums, self.ewm, ewm_recent, self.streak, self.day = self.undo
+        self.recent.clear(), self.recent.extend(recent)
+        self.ewm_recent.clear(), self.ewm_recent.extend(ewm_recent)
+        self.days.pop(), self.program_ewm.pop()
+        self.n, self.undo = self.n - 1, None
+        return True
+
+    def flags(self) -> dict:
+        lookback = self.cfg["lookback"]
+        if len(self.ewm_recent) <= lookback:
+            return {name: False for name in self.cfg["warnings"]}
+        change = self.ewm_recent[-1] - self.ewm_recent[0]
+        return {
+            name: bool(sign * change[COLUMNS.index(col)] >= self.cfg["min_change"])
+            for name, (col, sign) in self.cfg["warnings"].items()
+        }
+
+    def latest(self) -> dict:
+        if not self.n:
+            return {}
+        means = self.sums / len(self.recent)
+        return {
+            "date": epoch_day_to_date(self.day),
+            **{c: float(v) for c, v in zip(MEAN_COLUMNS, means)},
+            **{c: float(v) for c, v in zip(EWM_COLUMNS, self.ewm)},
+            "danger_streak": self.streak,
+            **self.flags(),
+        }
+
+    def overlay(self, n: int) -> tuple:
+        # program trend thinned to at most n points for the plot
+        step = max(1, -(-len(self.days) // max(n, 1)))
+        days = np.asarray(self.days[::step], dtype="i8")
+        return days, np.asarray(self.program_ewm[::step])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export tracker trend analytics")
+    parser.add_argument("src", help="history file (.csv or .bin)")
+    parser.add_argument("dst", help="trend file (.csv or .json)")
+    parser.add_argument("--cfg", default=os.path.join("data", "app_cfg.json"))
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with open(args.cfg) as f:
+        trends_cfg = json.load(f)["util"]["trends"]
+    store = STORE_FORMATS[file_format(args.src, STORE_FORMATS)](args.src)
+    trends = trend_frame(store.frame(), trends_cfg)
+    if args.dst.endswith(".json"):
+        trends.to_json(args.dst, orient="table", date_format="iso")
+    else:
+        trends.to_csv(args.dst)
@@ -1,16 +1,41 @@
+from __future__ import annotations
 import os
 import time
 import json
-import csv
-import pandas as pd
-from matplotlib import pyplot as plt
+import threading
+import numpy as np
 from kivy.app import App
 from pathlib import Path
-import seaborn as sns
 from kivy.resources import resource_find
+from lazy import lazy_module, timed_import
+from profiling import traced
+from downsample import Rollups, point_budget, reduce_columns
+from questions import Questionnaire, make_questions
+from journal import JournaledStore
+from worker import Worker
+from store import STORES, BinaryStore, columns_hash, date_to_epoch_day, read_hash
+from transfer import import_csv
+from trends import TrendState
+from program import ProgramConfig
+
+
+pd = lazy_module("pandas")
+_path_cache, _cfg_cache = {}, {}
+cache_stats = {"hits": 0, "misses": 0, "path_hits": 0, "path_misses": 0}
 
 
 def find_file(filename):
+    file = _path_cache.get(filename)
+    if file is not None:
+        cache_stats["path_hits"] += 1
+        return file
+    cache_stats["path_misses"] += 1
+    _path_cache[filename] = file = _resolve_file(filename)
+    return file
+
+
+@traced("io")
+def _resolve_file(filename):
     try:
         file_path = resource_find(filename)
     except:
@@ -24,9 +49,37 @@ def find_file(filename):
 
 
 
+def _cache_key(filename) -> str:
+    return os.path.realpath(filename)
+
+
+def _file_signature(path: str) -> tuple:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+@traced("io")
 def load_json(filename) -> dict:
-    with open(filename, "r") as file:
-        return json.load(file)
+    path = _cache_key(filename)
+    sig, cached = _file_signature(path), _cfg_cache.get(path)
+    if cached and cached[0] == sig:
+        cache_stats["hits"] += 1
+        return cached[1]
+    cache_stats["misses"] += 1
+    with open(path, "r") as file:
+        data = json.load(file)
+    _cfg_cache[path] = (sig, data)
+    return data
+
+
+def clear_cfg_cache() -> None:
+    _path_cache.clear(), _cfg_cache.clear()
+    for k in cache_stats:
+        cache_stats[k] = 0
+
+
+def get_cfg_cache_stats() -> dict:
+    return dict(cache_stats, entries=len(_cfg_cache))
 
 
 def get_json_file(filename, key=None):
@@ -46,21 +99,136 @@ def get_app_cfg(key=None):
     return get_json_file("app_cfg.json", key)
 
 
+_program = None
+
+
+def get_program() -> ProgramConfig:
+    # rebuilt only when program_cfg.json itself changed on disk
+    global _program
+    file = find_file("program_cfg.json")
+    base = load_json(file)
+    if _program is None or _program.base is not base:
+        compact_after = get_app_cfg()["util"]["program_cfg"]["compact_after"]
+        _program = ProgramConfig(base, file.with_name("program_cfg.log"), compact_after)
+    return _program
+
+
 def get_program_cfg(key=None):
-    return get_json_file("program_cfg.json", key)
+    data = get_program().data
+    return data[key] if key else data
 
 
+@traced("io")
 def write_data(data, filename):
-    with open(filename, "w") as file:
-        return json.dump(data, file)
+    path = _cache_key(filename)
+    with open(path, "w") as file:
+        json.dump(data, file)
+    _cfg_cache[path] = (_file_signature(path), data)
+    bump_data_version(os.path.basename(path))
+
+
+def bump_data_version(filename: str) -> None:
+    _data_versions[filename] = _data_versions.get(filename, 0) + 1
+
 
+_data_versions = {}
+
+
+def data_version(filename: str) -> int:
+    # bumped on every write, so screens built from a file can tell it changed
+    return _data_versions.get(filename, 0)
+
+
+_stores = {}
+
+
+def get_store():
+    storage_cfg = get_app_cfg()["util"]["storage"]
+    backend, csv_file = storage_cfg["backend"], get_dat_file()
+    path = csv_file.with_name(storage_cfg["files"][backend])
+    store = _stores.get((backend, path))
+    if store is None:
+        store = _stores[(backend, path)] = open_store(backend, path, csv_file)
+    return store
+
+
+@traced("io")
+def open_store(backend: str, path, csv_file):
+    if STORES[backend] is BinaryStore and not path.exists() and csv_file.exists():
+        # one-shot migration of the csv history; it only takes the store's
+        # name once complete, so an interrupted import starts over next launch
+        tmp = path.with_suffix(".tmp")
+        if tmp.exists():
+            tmp.unlink()
+        import_csv(csv_file, BinaryStore(tmp))  # fsyncs every chunk
+        os.replace(tmp, path)
+    store = STORES[backend](path)
+    journal_cfg = get_app_cfg()["util"]["storage"]["journal"]
+    if journal_cfg["enabled"]:
+        store = JournaledStore(
+            store,
+            f"{path}.wal",
+            journal_cfg["batch_records"],
+            journal_cfg["batch_ms"],
+            journal_cfg["checkpoint_records"],
+        )
+    return store
+
+
+def close_stores() -> None:
+    # checkpoints any journal so the next launch starts from the store alone
+    for store in _stores.values():
+        if isinstance(store, JournaledStore):
+            store.close()
+    _stores.clear()
+
+
+_rollups = None
+
+
+def get_rollups():
+    global _rollups
+    if _rollups is None:
+        _rollups = Rollups(*get_store().columns())
+    return _rollups
+
+
+_trends = None
+
+
+def get_trends() -> TrendState:
+    global _trends
+    if _trends is None:
+        with _store_lock:
+            days, scores = get_store().columns()
+            _trends = TrendState.from_columns(
+                days, scores, get_app_cfg()["util"]["trends"]
+            )
+    return _trends
 
+
+def trend_overlay():
+    return get_trends() if get_app_cfg()["util"]["trends"]["overlay"] else None
+
+
+def lod_rollups():
+    uses_rollups = get_app_cfg()["util"]["plot"]["lod"]["method"] == "rollup"
+    return get_rollups() if uses_rollups else None
+
+
+# writes run on the worker thread while the ui thread still reads
+_store_lock = threading.RLock()
+
+
+@traced("io")
 def store_measurement(data: list) -> None:
-    file = get_dat_file()
-    with open(file, "a+", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([''])
-        writer.writerow([get_date()] + data)
+    date = get_date()
+    with _store_lock:
+        get_store().append(date, data)
+        if _rollups is not None:
+            _rollups.add(date_to_epoch_day(date), data)
+        if _trends is not None:
+            _trends.add(date_to_epoch_day(date), data)
 
 
 def get_date() -> str:
@@ -73,150 +241,197 @@ def normalize_as_pct(
     return round(100 * ((val - min_val) / val_range))
 
 
+@traced("io")
 def get_formatted_df() -> pd.DataFrame:
-    file = get_dat_file()
-    df = pd.read_csv(file)
-    ys = [i for i in df.columns if i != "date"]
-    df.set_index("date", inplace=True)
-    if not df.empty:
-        df.index = pd.to_datetime(df.index, yearfirst=True)
-        df = df[ys]
-    else:
-        df = pd.DataFrame(columns=ys)
-        df.index = pd.to_datetime([])
-    return df
+    with _store_lock:
+        return get_store().frame()
+
+
+@traced("io")
+def get_graph_data(width_px: float = None) -> tuple:
+    with _store_lock:
+        days, scores = get_store().columns()
+        if width_px is not None:
+            plot_cfg = get_app_cfg()["util"]["plot"]
+            days, scores = reduce_columns(
+                days,
+                scores,
+                point_budget(width_px, plot_cfg),
+                plot_cfg["lod"]["method"],
+                lod_rollups(),
+            )
+        # copied while the lock is held: the store's columns map its file and
+        # drop_last shrinks it under any view the ui keeps
+        return np.array(days), np.array(scores)
 
 
+@traced("io")
 def new_entry_valid() -> bool:
-    df = get_formatted_df()
-    if df.empty:
-        return True
-    l_row = df.index[-1]
-    last_entry_today = (
-        str(l_row).split()[0] == str(pd.to_datetime(get_date())).split()[0]
-    )
-    return False if last_entry_today else True
+    with _store_lock:
+        last = get_store().last()
+    return last is None or last[0] != date_to_epoch_day(get_date())
 
 
+@traced("io")
 def overwrite_last_entry() -> None:
-    df = get_formatted_df()
-    df = df.drop(df.index[-1])
-    df.to_csv(get_dat_file())
-
-
-def create_field_questions(prefix: str, entries: list, suffix: str) -> list:
-    if not suffix:
-        suffix = "?"
-    return list(map(lambda x: " ".join([prefix, x, suffix]), entries))
-
-
+    global _trends
+    with _store_lock:
+        store = get_store()
+        last = store.last()
+        store.drop_last()
+        if last and _rollups is not None:
+            _rollups.remove(*last)
+        if last and _trends is not None and not _trends.remove_last():
+            _trends = None  # rebuilt from the store on next use
+
+
+@traced("io")
 def update_var_key_data(
     var_name: str,
     key: str,
     new_data: list,
 ) -> None:
-    program_cfg,file = get_program_cfg(),find_file("program_cfg.json")
-    temp = {}
-    for var in program_cfg.keys():
-        temp[var] = program_cfg[var]
-        if var == var_name:
-            temp[var][key]["user"] = new_data
-    write_data(temp, file)
+    # logged as a delta; the whole file is only rewritten on compaction
+    program = get_program()
+    if not program.set_user(var_name, key, new_data):
+        return
+    if program.needs_compaction():
+        write_data(program.data, find_file("program_cfg.json"))
+        program.compacted()
+    else:
+        bump_data_version("program_cfg.json")
+    reset_questionnaire()
 
 
 def unconfigured_vars() -> list:
-    program_cfg = get_program_cfg()
-    vars, unconfigured = (
-        list(program_cfg.keys()),
-        [],
-    )
-    for var in vars:
-        for v in program_cfg[var].values():
-            if not v["user"]:
-                unconfigured.append(v)
-    return unconfigured
+    program = get_program()
+    return [] if program.fully_configured() else program.unconfigured()
+
+
+WILLPOWER_PROMPTS = [("Do you want to", "Desires", None)]
+NEG_REINFORCEMENT_PROMPTS = [
+    ("Are you", "Restrictions", None),
+    ("Are you", "Boundaries", None),
+    ("Are you", "Accountability", None),
+    ("Have you", "Relapse", None),
+]
+OBSESSION_PROMPTS = [
+    ("Did you forget to take your medication to manage", "Mental", None),
+    ("Are you addicted to", "Addiction", None),
+]
+POS_REINFORCEMENT_PROMPTS = [
+    ("Have you lived in accordance with", "Values", None),
+    ("Have you done your daily", "Daily", None),
+    ("Have you been a part of a", "Fellowship", "fellowship today?"),
+]
+# measurement order, matching the columns of the data store
+PROGRAM_PROMPTS = [
+    ("willpower", WILLPOWER_PROMPTS),
+    ("negative reinforcement", NEG_REINFORCEMENT_PROMPTS),
+    ("obsession", OBSESSION_PROMPTS),
+    ("positive reinforcement", POS_REINFORCEMENT_PROMPTS),
+]
+_questionnaire = None
+
+
+def get_questionnaire() -> Questionnaire:
+    global _questionnaire
+    if _questionnaire is None:
+        _questionnaire = Questionnaire(get_program_cfg(), PROGRAM_PROMPTS)
+    return _questionnaire
+
+
+def reset_questionnaire() -> None:
+    global _questionnaire
+    _questionnaire = None
 
 
 def mk_questions(var: str, prompts_cfg: list) -> list:
-    file, q = get_program_cfg(var), []
-    for pre, field, suf in prompts_cfg:
-        q += create_field_questions(pre, file[field]["user"], suf)
-    return q
+    return make_questions(get_program_cfg(var), prompts_cfg)
 
 
-def will_power() -> float:
-    return mk_questions("willpower", [("Do you want to", "Desires", None)])
+def will_power() -> list:
+    return get_questionnaire().var_questions("willpower")
 
 
-def neg_reinforcement() -> float:
-    dq_args, dr_args = list(
-        tuple(
-            zip(
-                ["Are you"] * 3,
-                ["Restrictions", "Boundaries", "Accountability"],
-                3 * [None],
-            )
-        )
-    ), [("Have you", "Relapse", None)]
-    return mk_questions("negative reinforcement", dq_args + dr_args)
-
-
-def obsession() -> float:
-    args = [
-        ("Did you forget to take your medication to manage", "Mental", None),
-        ("Are you addicted to", "Addiction", None),
-    ]
-    return mk_questions("obsession", args)
-
-
-def pos_reinforcement() -> float:
-    args = [
-        ("Have you lived in accordance with", "Values", None),
-        ("Have you done your daily", "Daily", None),
-        ("Have you been a part of a", "Fellowship", "fellowship today?"),
-    ]
-    return mk_questions("positive reinforcement", args)
-
-
-def get_warn_index(df):
-    plot_cfg=get_app_cfg()["util"]["plot"]
-    df_index = df.index
-    min_date, max_date = min(df_index), max(df_index)
-    return min_date + (plot_cfg["warning"]["offset_dist"] * (max_date - min_date))
-
-
-def set_plot_options(df: pd.DataFrame) -> None:
-    plot_cfg=get_app_cfg()["util"]["plot"]
-    WARN = plot_cfg["warning"]
-    LEG = plot_cfg["legend"]
-    AXES = plot_cfg["axes"]
-    sns.set_theme(context="notebook", style="darkgrid", palette="muted")
-    if not df.empty:
-        df.plot(style=["ms-", "go-", "y^-", "bs-", "rs-"])
-        plt.text(
-            x=get_warn_index(df),
-            y=15,
-            s="Relapse Danger Zone",
-            fontsize=WARN["font_size"],
-            va="center",
-            ha="center",
-        )
-        plt.axhspan(ymin=0, ymax=25, color=WARN["color"], alpha=WARN["opacity"])
-        plt.legend(loc=LEG["loc"], fontsize=LEG["font_size"])
-    plt.xlabel("Time", fontsize=AXES["font_size"])
-    plt.ylabel("Total % Value", fontsize=AXES["font_size"])
+def neg_reinforcement() -> list:
+    return get_questionnaire().var_questions("negative reinforcement")
+
+
+def obsession() -> list:
+    return get_questionnaire().var_questions("obsession")
+
 
-    ax = plt.gca()
-    ax.tick_params(axis="x", labelsize=AXES["tick_font_size"])
-    ax.tick_params(axis="y", labelsize=AXES["tick_font_size"])
+def pos_reinforcement() -> list:
+    return get_questionnaire().var_questions("positive reinforcement")
 
 
+_renderer = None
+
+
+def get_renderer():
+    global _renderer
+    if _renderer is None:
+        # pulls in matplotlib/seaborn on first use only
+        plot = timed_import("plot")
+        _renderer = plot.GraphRenderer(get_app_cfg()["util"]["plot"])
+    return _renderer
+
+
+def close_renderer() -> None:
+    global _renderer
+    if _renderer is not None:
+        _renderer.close()
+    _renderer = None
+
+
+@traced("io")
 def store_daily_visualization() -> None:
-    df = get_formatted_df()
-    set_plot_options(df)
-    plt.savefig(get_img_file())
+    img_file, overlay = get_img_file(), get_app_cfg()["util"]["trends"]["overlay"]
+    with _store_lock:
+        # the overlay is derived from the data alone
+        digest = columns_hash(*get_store().columns()) + ("+trend" if overlay else "")
+        if img_file.exists() and read_hash(f"{img_file}.sha1") == digest:
+            return  # checked before the plotting stack is imported
+        df = get_formatted_df()
+    get_renderer().render(df, img_file, lod_rollups(), trend_overlay(), digest)
+
+
+_worker = None
+
+
+def get_worker() -> Worker:
+    global _worker
+    if _worker is None:
+        _worker = Worker()
+    return _worker
 
 
-def update_reccords(data) -> None:
-    store_measurement(data)
-    store_daily_visualization()
+def close_worker() -> None:
+    global _worker
+    if _worker is not None:
+        _worker.close()
+    _worker = None
+
+
+def run_in_background(func, *args, key=None, on_done=None) -> None:
+    get_worker().submit(func, *args, key=key, on_done=on_done)
+
+
+def graph_uses_image() -> bool:
+    return get_app_cfg("main")["graph"]["widget"] == "image"
+
+
+def queue_render(on_rendered=None) -> None:
+    # back-to-back renders collapse, and the sha1 check skips the draw when
+    # the store has not changed since the cached png
+    run_in_background(store_daily_visualization, key="render", on_done=on_rendered)
+
+
+def update_reccords(data, on_rendered=None) -> None:
+    # queued behind any pending overwrite
+    if graph_uses_image():
+        run_in_background(store_measurement, data)
+        queue_render(on_rendered)
+    else:
+        run_in_background(store_measurement, data, on_done=on_rendered)
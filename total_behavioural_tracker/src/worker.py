@@ -0,0 +1,116 @@
+import time
+import threading
+from collections import deque
+from kivy.clock import Clock
+from kivy.logger import Logger
+from profiling import span
+
+
+class Job(object):
+    def __init__(self, func, args, key, on_done):
+        self.func, self.args, self.key = func, args, key
+        self.callbacks = [on_done] if on_done else []
+        self.submitted = time.perf_counter()
+
+
+class Worker(object):
+    # runs store writes and graph renders in submission order on a single
+    # thread; completions are delivered on the kivy main loop
+    def __init__(self, name="tracker-io"):
+        self.name = name
+        self.cond = threading.Condition()
+        self.queue, self.pending = deque(), {}
+        self.thread, self.closed, self.running = None, False, None
+        self.stats = {"submitted": 0, "coalesced": 0, "done": 0, "failed": 0}
+
+    def submit(self, func, *args, key=None, on_done=None) -> Job:
+        # a job with the same key that has not started yet absorbs this one
+        with self.cond:
+            if self.closed:
+                raise RuntimeError(f"worker '{self.name}' is closed")
+            self.stats["submitted"] += 1
+            job = self.pending.get(key) if key is not None else None
+            if job is not None:
+                self.stats["coalesced"] += 1
+                if on_done:
+                    job.callbacks.append(on_done)
+                return job
+            job = Job(func, args, key, on_done)
+            self.queue.append(job)
+            if key is not None:
+                self.pending[key] = job
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name=self.name, daemon=True
+                )
+                self.thread.start()
+            self.cond.notify()
+            return job
+
+    def next_job(self):
+        with self.cond:
+            while not self.queue and not self.closed:
+                self.cond.wait()
+            if not self.queue:
+                return None
+            job = self.running = self.queue.popleft()
+            self.pending.pop(job.key, None)
+            return job
+
+    def run(self) -> None:
+        while True:
+            job = self.next_job()
+            if job is None:
+                return
+            name = getattr(job.func, "__name__", str(job.func))
+            waited_ms = (time.perf_counter() - job.submitted) * 1000
+            try:
+                with span(name, "worker", waited_ms=round(waited_ms, 3)):
+                    job.func(*job.args)
+            except Exception as e:
+                self.stats["failed"] += 1
+                Logger.exception(f"Worker: {name} failed: {e}")
+                continue
+            finally:
+                with self.cond:
+                    self.running = None
+                    self.cond.notify_all()
+            self.stats["done"] += 1
+            for callback in job.callbacks:
+                Clock.schedule_once(lambda dt, cb=callback: cb())
+
+    def wait_idle(self, timeout=None) -> bool:
+        with self.cond:
+            return self.cond.wait_for(
+                lambda: not self.queue and self.running is None, timeout
+            )
+
+    def close(self, timeout=None) -> None:
+        # lets queued jobs finish, so nothing submitted is lost on exit
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+
+UI_BLOCKING = {}
+
+
+def ui_blocking(name: str):
+    # times a ui callback: everything it does runs while the main loop waits
+    def wrap(func):
+        def run(*args, **kwargs):
+            t = time.perf_counter()
+            try:
+                with span(name, "ui"):
+                    return func(*args, **kwargs)
+            finally:
+                ms = (time.perf_counter() - t) * 1000
+                count, total, worst = UI_BLOCKING.get(name, (0, 0.0, 0.0))
+                UI_BLOCKING[name] = (count + 1, total + ms, max(worst, ms))
+                Logger.debug(f"UiBlock: {name} blocked the ui for {ms:.1f} ms")
+
+        return run
+
+    return wrap